@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# purpose: to total io1 to gp3 savings across the fleet from the parquet dataset written by main.py --parquet_dir
+# example by account, region, engine and multi-az: python aggregate.py --parquet_dir data/rds_output
+# one combined grouping: python aggregate.py --parquet_dir data/rds_output -g account_id engine
+
+import argparse
+import logging
+import os
+import pandas as pd
+from tabulate import tabulate
+import traceback
+
+from classes.fleetdataset import Fleetdataset
+
+# parse command-line arguments for dataset and groupings
+def parse_args():
+    try:
+        parser = argparse.ArgumentParser(description='fleet-wide savings aggregation')
+        parser.add_argument('--parquet_dir', help='parquet dataset written by main.py --parquet_dir', type=str, required=True)
+        parser.add_argument('-g', '--group_by', help='columns of one combined grouping, default is each of account_id, region, engine and multi_az', type=str, nargs='+', required=False)
+        parser.add_argument('-o', '--output_file', help='aggregation output filepath', type=str, required=False)
+        parser.add_argument('-l', '--log_level', help='python log level', type=str, required=False)
+        parser.set_defaults(\
+                            output_file = 'data/fleet_summary.csv',
+                            log_level = 'INFO'
+                            )
+        args = parser.parse_args()
+        return args
+    except Exception as e:
+        logging.error(f'An error occurred during parsing of args')
+        traceback.print_exc()
+
+def main():
+
+    args = parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=args.log_level)
+
+    fleetdataset = Fleetdataset(args.parquet_dir)
+    groupings = [args.group_by] if args.group_by is not None else [['account_id'], ['region'], ['engine'], ['multi_az']]
+
+    summary_dfs = []
+    for group_columns in groupings:
+        totals_df = fleetdataset.aggregate(group_columns)
+        logging.info(f"Savings by {', '.join(group_columns)}:\n" + tabulate(totals_df, headers='keys', tablefmt='psql', showindex=False))
+        # one long table: grouping name, group value and totals
+        totals_df.insert(0, 'group_by', '/'.join(group_columns))
+        totals_df.insert(1, 'group', totals_df[group_columns].astype(str).agg('/'.join, axis=1))
+        summary_dfs.append(totals_df.drop(columns=group_columns))
+
+    summary_df = pd.concat(summary_dfs, ignore_index=True)
+    if os.path.dirname(args.output_file):
+        os.makedirs(os.path.dirname(args.output_file), exist_ok=True)
+    summary_df.to_csv(args.output_file, index=False)
+    logging.info(f'Aggregation written to: {args.output_file}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# startup/CPU profile: a new boto3 client per row vs clients reused from the client registry
+# no AWS calls are made, only sessions and clients are created
+# usage: python -m benchmarks.bench_client_registry -j 20 -n 50
+
+import argparse
+import boto3
+import cProfile
+import io
+import pstats
+import time
+
+from classes.clientregistry import Clientregistry
+
+def per_row_clients(jobs, instances):
+    # before: a session per job, three sts clients for the caller identity and a cloudwatch client per instance
+    for job in range(jobs):
+        session = boto3.Session(region_name='us-east-1', aws_access_key_id=f'AKIA{job:016d}', aws_secret_access_key='secret', aws_session_token='token')
+        for i in range(3):
+            session.client('sts')
+        session.client('rds', region_name='us-east-1')
+        for instance in range(instances):
+            session.client('cloudwatch', region_name='us-east-1')
+
+def registry_clients(jobs, instances):
+    # after: the same work and the same credentials per job through the registry, a job reuses its session and clients
+    clients = Clientregistry()
+    for job in range(jobs):
+        session = clients.get_session('us-east-1', aws_access_key_id=f'AKIA{job:016d}', aws_secret_access_key='secret', aws_session_token='token')
+        clients.get_client(session, 'sts', None, job)
+        clients.get_client(session, 'rds', 'us-east-1', job)
+        for instance in range(instances):
+            clients.get_client(session, 'cloudwatch', 'us-east-1', job)
+
+def profile(label, fn, top):
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    fn()
+    profiler.disable()
+    elapsed = time.perf_counter() - start
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(top)
+    print(f'--- {label}: {elapsed:.3f}s')
+    print(output.getvalue())
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='client creation profile')
+    parser.add_argument('-j', '--jobs', help='account/region jobs', type=int, default=20)
+    parser.add_argument('-n', '--instances', help='instances per job', type=int, default=50)
+    parser.add_argument('-t', '--top', help='profile rows to print', type=int, default=12)
+    args = parser.parse_args()
+
+    before = profile('client per row', lambda: per_row_clients(args.jobs, args.instances), args.top)
+    after = profile('client registry', lambda: registry_clients(args.jobs, args.instances), args.top)
+    print(f'client creation time saved: {before - after:.3f}s ({before / max(after, 1e-9):.0f}x faster)')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmark and golden check: row-by-row apply cost functions vs the vectorized cost engine
+# usage: python -m benchmarks.bench_cost_engine -n 100000 -g 5000 -p 0.19
+
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+import time
+
+from benchmarks.synthetic import make_pricing_df, make_instance_df
+from classes.costengine import Costengine
+from classes.getinstanceinfo import Getinstanceinfo
+
+def apply_costs(getinstanceinfo, instance_df, pricing_index, args):
+    # the per-row path used before the cost engine
+    instance_df = instance_df.copy()
+    instance_df['storage_throughput'] = \
+        instance_df.apply (lambda row: getinstanceinfo.calc_io1_throughput(row, args), axis=1, result_type='expand')
+    instance_df['current_monthly_storage_cost'] = \
+        instance_df.apply (lambda row: getinstanceinfo.get_current_price(row, pricing_index, args), axis=1, result_type='expand')
+    instance_df['gp3_monthly_storage_cost'] = \
+        instance_df.apply (lambda row: getinstanceinfo.get_future_price(row, pricing_index, args), axis=1, result_type='expand')
+    return instance_df
+
+def engine_costs(costengine, instance_df, pricing_index, args):
+    instance_df = instance_df.copy()
+    instance_df['storage_throughput'] = costengine.calc_io1_throughput(instance_df)
+    instance_df['current_monthly_storage_cost'] = costengine.get_current_price(instance_df, pricing_index, args)
+    instance_df['gp3_monthly_storage_cost'] = costengine.get_future_price(instance_df, pricing_index, args)
+    return instance_df
+
+def main():
+    parser = argparse.ArgumentParser(description='cost engine benchmark')
+    parser.add_argument('-n', '--instances', help='synthetic instances for the vectorized timing', type=int, default=100000)
+    parser.add_argument('-g', '--golden', help='synthetic instances for the golden comparison and apply timing', type=int, default=5000)
+    parser.add_argument('-p', '--percent_discount', help='public pricing discount', type=float, required=False)
+    args = parser.parse_args()
+
+    # the row-based functions log every row at info level
+    logging.basicConfig(level='WARNING')
+
+    getinstanceinfo = Getinstanceinfo()
+    costengine = Costengine()
+    pricing_index = getinstanceinfo.build_pricing_index(make_pricing_df(1000))
+
+    golden_df = make_instance_df(args.golden, seed=1)
+    start = time.perf_counter()
+    expected = apply_costs(getinstanceinfo, golden_df, pricing_index, args)
+    apply_seconds = time.perf_counter() - start
+    actual = engine_costs(costengine, golden_df, pricing_index, args)
+
+    for column in ['storage_throughput', 'current_monthly_storage_cost', 'gp3_monthly_storage_cost']:
+        np.testing.assert_allclose(
+            pd.to_numeric(actual[column], errors='coerce').to_numpy(dtype=float),
+            pd.to_numeric(expected[column], errors='coerce').to_numpy(dtype=float),
+            rtol=1e-12, equal_nan=True, err_msg=column)
+    print(f'golden check passed on {args.golden} instances')
+
+    instance_df = make_instance_df(args.instances, seed=2)
+    start = time.perf_counter()
+    engine_costs(costengine, instance_df, pricing_index, args)
+    engine_seconds = time.perf_counter() - start
+
+    print(f'apply path: {apply_seconds:.3f}s for {args.golden} instances ({1e6 * apply_seconds / args.golden:.1f} us per instance)')
+    print(f'cost engine: {engine_seconds:.3f}s for {args.instances} instances ({1e6 * engine_seconds / args.instances:.2f} us per instance)')
+    print(f'speedup per instance: {(apply_seconds / args.golden) / (engine_seconds / args.instances):.0f}x')
+
+if __name__ == "__main__":
+    main()
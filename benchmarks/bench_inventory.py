@@ -0,0 +1,78 @@
+# benchmark: per-instance pd.concat inventory building vs the buffered linear builder
+# usage: python -m benchmarks.bench_inventory -p 500 -r 100 -o 50
+
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+import time
+import tracemalloc
+
+from classes.getinstanceinfo import Getinstanceinfo
+
+def make_pages(pages, records_per_page, seed=0):
+    # synthetic describe_db_instances response pages
+    rng = np.random.default_rng(seed)
+    engines = ['postgres', 'mysql', 'mariadb', 'sqlserver-se', 'oracle-ee']
+    for page in range(pages):
+        db_instances = []
+        for record in range(records_per_page):
+            storage_type = rng.choice(['io1', 'gp2', 'gp3'])
+            dbinstance = {
+                'DBInstanceIdentifier': f'db-{page}-{record}',
+                'DBInstanceClass': 'db.r5.large',
+                'DBName': 'app',
+                'Engine': str(rng.choice(engines)),
+                'MultiAZ': bool(rng.random() < 0.4),
+                'StorageType': str(storage_type),
+                'AllocatedStorage': int(rng.choice([100, 400, 1000]))
+            }
+            if storage_type != 'gp2':
+                dbinstance['Iops'] = int(rng.choice([3000, 12000, 40000]))
+            if storage_type == 'gp3':
+                dbinstance['StorageThroughput'] = 125
+            db_instances.append(dbinstance)
+        yield {'DBInstances': db_instances}
+
+def concat_builder(getinstanceinfo, pages, region):
+    # builder used before, one single-row DataFrame and pd.concat per instance
+    instance_df = pd.DataFrame()
+    for page in pages:
+        for dbinstance in page['DBInstances']:
+            row_dict = getinstanceinfo.build_instance_record(dbinstance, region)
+            if row_dict is None:
+                continue
+            instance_df = pd.concat([instance_df, pd.DataFrame([row_dict])], ignore_index=True)
+    return instance_df
+
+def measure(fn):
+    # timing without tracemalloc overhead, then a second run for peak memory
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description='inventory builder benchmark')
+    parser.add_argument('-p', '--pages', help='describe_db_instances pages for the linear builder', type=int, default=500)
+    parser.add_argument('-r', '--records', help='instances per page', type=int, default=100)
+    parser.add_argument('-o', '--old_pages', help='pages for the pd.concat builder, it is quadratic', type=int, default=50)
+    args = parser.parse_args()
+
+    logging.basicConfig(level='WARNING')
+    getinstanceinfo = Getinstanceinfo()
+
+    all_pages = list(make_pages(max(args.pages, args.old_pages), args.records))
+    for pages in sorted({args.old_pages, args.pages}):
+        instance_df, elapsed, peak = measure(lambda: getinstanceinfo.build_instance_df(all_pages[:pages], 'us-east-1'))
+        print(f'linear builder: {len(instance_df)} instances in {elapsed:.3f}s, peak {peak / 2**20:.1f} MiB, frame {instance_df.memory_usage(deep=True).sum() / 2**20:.1f} MiB')
+
+    instance_df, elapsed, peak = measure(lambda: concat_builder(getinstanceinfo, all_pages[:args.old_pages], 'us-east-1'))
+    print(f'pd.concat builder: {len(instance_df)} instances in {elapsed:.3f}s, peak {peak / 2**20:.1f} MiB, frame {instance_df.memory_usage(deep=True).sum() / 2**20:.1f} MiB')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# end-to-end benchmark of main.py against the simulated AWS backend and a local synthetic bulk price list
+# each fleet size runs main in its own subprocess, results come from the run report (wall time, api calls, peak rss)
+# usage: python -m benchmarks.bench_pipeline -f 10 1000 10000 100000 -a 20 -g 3 -w 8
+# extra main.py arguments are passed through, e.g. --chunk_size 500 or --async_collect
+
+import argparse
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import functools
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from benchmarks.synthetic import write_pricing_csv
+
+offer_version = '20260101000000'
+region_names = ['us-east-1', 'us-east-2', 'us-west-1', 'us-west-2', 'eu-west-1', 'eu-central-1', 'ap-southeast-1', 'ap-northeast-1']
+
+def write_pricing_mirror(directory, regions, rows):
+    # same paths as pricing.us-east-1.amazonaws.com: region_index.json and one index.csv per region
+    offer_dir = os.path.join(directory, 'offers', 'v1.0', 'aws', 'AmazonRDS')
+    pricing_csv = os.path.join(directory, 'index.csv')
+    os.makedirs(directory, exist_ok=True)
+    write_pricing_csv(pricing_csv, rows)
+    region_index = {'regions': {}}
+    for region in regions:
+        os.makedirs(os.path.join(offer_dir, offer_version, region), exist_ok=True)
+        os.symlink(pricing_csv, os.path.join(offer_dir, offer_version, region, 'index.csv'))
+        region_index['regions'][region] = {'currentVersionUrl': f'/offers/v1.0/aws/AmazonRDS/{offer_version}/{region}/index.json'}
+    os.makedirs(os.path.join(offer_dir, 'current'), exist_ok=True)
+    with open(os.path.join(offer_dir, 'current', 'region_index.json'), 'w') as f:
+        json.dump(region_index, f)
+
+def start_pricing_server(directory):
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+def run_pipeline(args, main_args):
+    # child process: simulated backend in the client registry, main() on an input list of accounts x regions
+    import main
+    from benchmarks.simulatedaws import Simulatedaws
+    from classes.clientregistry import clients
+
+    accounts = [f'{100000000000 + i}' for i in range(args.accounts)]
+    regions = region_names[:args.regions]
+    instances_per_region = math.ceil(args.run / (len(accounts) * len(regions)))
+    latency_ms = {'sts': args.latency_ms, 'ec2': args.latency_ms, 'rds': args.latency_ms, 'cloudwatch': args.latency_ms}
+    backend = Simulatedaws(accounts, regions, instances_per_region, latency_ms, args.throttle_rate)
+    clients.session_factory = backend.session
+
+    pricing_host = start_pricing_server(args.pricing_dir)
+    os.chdir(args.workdir)
+    with open('accounts.csv', 'w') as f:
+        f.write('account,region,role_arn\n')
+        for account_id in accounts:
+            for region in regions:
+                f.write(f'{account_id},{region},arn:aws:iam::{account_id}:role/benchmark\n')
+
+    sys.argv = ['main.py', '-i', 'accounts.csv', '-w', str(args.workers), '-p', '0.19', '-l', 'WARNING',
+                '--pricing_endpoint', pricing_host, '--pricing_cache_dir', 'cache/pricing', '--report_file', 'report.json'] + main_args
+    main.main()
+
+    with open('report.json') as f:
+        report = json.load(f)
+    print(json.dumps({
+        'fleet': args.run,
+        'jobs': len(accounts) * len(regions),
+        'instances': report['counters'].get('instances_collected', 0),
+        'wall_seconds': report['wall_seconds'],
+        'peak_rss_mib': report['peak_rss_bytes'] / 2**20,
+        'api': {service: counters['requests'] for service, counters in report['api'].items()},
+        'throttles': sum(backend.throttles.values()),
+        'stages': {name: round(stage['seconds'], 2) for name, stage in report['stages'].items()}
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description='end-to-end pipeline benchmark against a simulated AWS backend')
+    parser.add_argument('-f', '--fleets', help='fleet sizes (instances) to run', type=int, nargs='+', default=[10, 1000, 10000, 100000])
+    parser.add_argument('-a', '--accounts', help='accounts in the fleet', type=int, default=20)
+    parser.add_argument('-g', '--regions', help=f'regions per account (max {len(region_names)})', type=int, default=3)
+    parser.add_argument('-w', '--workers', help='main.py --workers', type=int, default=8)
+    parser.add_argument('--latency_ms', help='simulated latency per AWS request', type=float, default=0)
+    parser.add_argument('--throttle_rate', help='fraction of simulated AWS requests that are throttled', type=float, default=0)
+    parser.add_argument('--pricing_rows', help='rows in the synthetic bulk price list', type=int, default=100000)
+    parser.add_argument('--run', help=argparse.SUPPRESS, type=int, required=False)
+    parser.add_argument('--pricing_dir', help=argparse.SUPPRESS, type=str, required=False)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS, type=str, required=False)
+    args, main_args = parser.parse_known_args()
+
+    if args.run is not None:
+        run_pipeline(args, main_args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        pricing_dir = os.path.join(directory, 'pricing')
+        write_pricing_mirror(pricing_dir, region_names[:args.regions], args.pricing_rows)
+        options = ['-a', str(args.accounts), '-g', str(args.regions), '-w', str(args.workers),
+                   '--latency_ms', str(args.latency_ms), '--throttle_rate', str(args.throttle_rate)]
+        for fleet in args.fleets:
+            workdir = os.path.join(directory, f'fleet_{fleet}')
+            os.makedirs(workdir)
+            command = [sys.executable, '-m', 'benchmarks.bench_pipeline', '--run', str(fleet), '--pricing_dir', pricing_dir, '--workdir', workdir] + options + main_args
+            output = subprocess.run(command, capture_output=True, text=True, cwd=os.getcwd())
+            if output.returncode != 0:
+                print(f'fleet {fleet} failed:\n{output.stderr[-2000:]}')
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            api = ', '.join(f'{service} {requests}' for service, requests in sorted(result['api'].items()))
+            print(f"fleet {result['fleet']}: {result['instances']} instances in {result['jobs']} jobs, {result['wall_seconds']:.2f}s, "
+                  f"peak rss {result['peak_rss_mib']:.0f} MiB, requests: {api}, throttles {result['throttles']}")
+            print(f"  stages (s, summed over workers): {result['stages']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# micro-benchmark: per-instance price lookups with str.contains scans vs the prebuilt pricing index
+# usage: python -m benchmarks.bench_pricing_lookup -r 300000 -n 200
+
+import argparse
+import time
+
+from benchmarks.synthetic import make_pricing_df, make_instance_df
+from classes.getinstanceinfo import Getinstanceinfo
+
+def str_contains_price(rds_pricing_df, usage_type):
+    # lookup used before the pricing index existed
+    temp_df = rds_pricing_df[rds_pricing_df['usageType'].str.contains(usage_type)]
+    return float(temp_df['PricePerUnit'].iat[0])
+
+def main():
+    parser = argparse.ArgumentParser(description='pricing lookup micro-benchmark')
+    parser.add_argument('-r', '--rows', help='rows in the synthetic price list', type=int, default=300000)
+    parser.add_argument('-n', '--instances', help='io1 instances to price', type=int, default=200)
+    args = parser.parse_args()
+
+    getinstanceinfo = Getinstanceinfo()
+    rds_pricing_df = make_pricing_df(args.rows)
+    instance_df = make_instance_df(args.instances)
+
+    start = time.perf_counter()
+    for row in instance_df.itertuples():
+        prefix = ':Multi-AZ-' if row.multi_az else ':'
+        for component in ['PIOPS-Storage', 'PIOPS', 'GP3-Storage', 'GP3-PIOPS', 'GP3-Throughput']:
+            str_contains_price(rds_pricing_df, prefix + component)
+    scan_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pricing_index = getinstanceinfo.build_pricing_index(rds_pricing_df)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in instance_df.itertuples():
+        deployment = getinstanceinfo.get_deployment_option(row)
+        for component in getinstanceinfo.storage_components:
+            pricing_index[(deployment, component)]
+    index_seconds = time.perf_counter() - start
+
+    print(f'price list rows: {args.rows}, instances: {args.instances}')
+    print(f'str.contains scans: {1e3 * scan_seconds / args.instances:.3f} ms per instance')
+    print(f'index build (once per region): {1e3 * build_seconds:.1f} ms')
+    print(f'index lookups: {1e6 * index_seconds / args.instances:.3f} us per instance')
+    print(f'speedup per instance: {scan_seconds / max(index_seconds, 1e-9):.0f}x')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# memory benchmark: full read_csv of the bulk price list vs the column-pruned, filtered chunked loader
+# each loader runs in its own subprocess so peak RSS is not shared between them
+# usage: python -m benchmarks.bench_pricing_memory -r 300000
+
+import argparse
+import json
+import os
+import pandas as pd
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import write_pricing_csv
+from classes.getinstanceinfo import Getinstanceinfo
+
+def full_loader(pricing_csv):
+    # loader used before, every column as object dtype
+    pricing_df = pd.read_csv(pricing_csv, skiprows=5)
+    pricing_df.columns = pricing_df.columns.str.replace(' ', '')
+    return pricing_df
+
+def run_loader(loader, pricing_csv):
+    tracemalloc.start()
+    start = time.perf_counter()
+    if loader == 'full':
+        pricing_df = full_loader(pricing_csv)
+    else:
+        pricing_df = Getinstanceinfo().read_pricing_csv(pricing_csv)
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(json.dumps({
+        'loader': loader,
+        'rows': len(pricing_df),
+        'seconds': elapsed,
+        'traced_peak_mib': traced_peak / 2**20,
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'frame_mib': pricing_df.memory_usage(deep=True).sum() / 2**20
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description='pricing loader memory benchmark')
+    parser.add_argument('-r', '--rows', help='rows in the synthetic price list', type=int, default=300000)
+    parser.add_argument('-c', '--columns', help='extra descriptive columns in the synthetic price list', type=int, default=40)
+    parser.add_argument('--run', help=argparse.SUPPRESS, nargs=2, required=False)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        run_loader(*args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        pricing_csv = os.path.join(directory, 'index.csv')
+        write_pricing_csv(pricing_csv, args.rows, args.columns)
+        print(f'synthetic price list: {args.rows} rows, {os.path.getsize(pricing_csv) / 2**20:.0f} MiB')
+        for loader in ['full', 'pruned']:
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_pricing_memory', '--run', loader, pricing_csv], capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{result['loader']} loader: {result['rows']} rows in {result['seconds']:.2f}s, traced peak {result['traced_peak_mib']:.1f} MiB, "
+                  f"peak rss {result['peak_rss_mib']:.1f} MiB, frame {result['frame_mib']:.2f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# runs main.py against a local moto server through --endpoint_url, synchronously, with --async_collect and with --chunk_size
+# every collection mode must write the same instances and costs
+# usage: python -m benchmarks.check_moto_server -n 20
+# needs moto[server] (pip install "moto[server]"), it is not a requirement of main.py
+# moto has no percentile statistics, its p98 get_metric_data answers fail server side (moto logs a traceback, botocore retries)
+# so those columns stay empty and each run takes a minute or so
+
+import argparse
+from datetime import datetime, timedelta, timezone
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+
+import boto3
+from moto.server import ThreadedMotoServer
+import pandas as pd
+
+from benchmarks.bench_pipeline import start_pricing_server, write_pricing_mirror
+
+region = 'us-east-1'
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def create_fleet(endpoint_url, instances):
+    # io1 instances with a few hours of storage metrics, alternating single and multi-az
+    rds = boto3.client('rds', region_name=region, endpoint_url=endpoint_url)
+    cloudwatch = boto3.client('cloudwatch', region_name=region, endpoint_url=endpoint_url)
+    now = datetime.now(timezone.utc)
+    for index in range(instances):
+        identifier = f'moto-db-{index}'
+        rds.create_db_instance(DBInstanceIdentifier=identifier, DBInstanceClass='db.r5.large', Engine='postgres',
+                               AllocatedStorage=[100, 400, 1000][index % 3], StorageType='io1', Iops=[3000, 12000][index % 2],
+                               MultiAZ=index % 2 == 1, MasterUsername='admin', MasterUserPassword='password123')
+        for metric_name, value in [('FreeStorageSpace', 50 * 2**30), ('WriteIOPS', 100.0 + index), ('ReadIOPS', 50.0 + index),
+                                   ('WriteThroughput', 2**20 * (1 + index)), ('ReadThroughput', 2**19 * (1 + index))]:
+            cloudwatch.put_metric_data(Namespace='AWS/RDS', MetricData=[
+                {'MetricName': metric_name, 'Dimensions': [{'Name': 'DBInstanceIdentifier', 'Value': identifier}],
+                 'Timestamp': now - timedelta(hours=hour), 'Value': value} for hour in range(1, 4)])
+
+def run_main(endpoint_url, pricing_host, workdir, name, extra_args):
+    output_file = os.path.join(workdir, f'{name}.csv')
+    command = [sys.executable, 'main.py', '-r', region, '-d', '1', '-p', '0.19', '-l', 'WARNING', '-o', output_file,
+               '--endpoint_url', endpoint_url, '--pricing_endpoint', pricing_host,
+               '--pricing_cache_dir', os.path.join(workdir, 'cache'), '--manifest', os.path.join(workdir, 'manifest.json')] + extra_args
+    output = subprocess.run(command, capture_output=True, text=True)
+    if output.returncode != 0 or not os.path.exists(output_file):
+        print(f'{name} run failed:\n{output.stderr[-2000:]}')
+        return None
+    return pd.read_csv(output_file).sort_values('instance').reset_index(drop=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='check main.py collection modes against a local moto server')
+    parser.add_argument('-n', '--instances', help='io1 instances created in moto', type=int, default=20)
+    args = parser.parse_args()
+
+    # moto accepts any credentials, only the variables must be set, the sts caller client has no region of its own
+    for variable, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'), ('AWS_DEFAULT_REGION', region)]:
+        os.environ.setdefault(variable, value)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    endpoint_url = f'http://127.0.0.1:{port}'
+    try:
+        create_fleet(endpoint_url, args.instances)
+        with tempfile.TemporaryDirectory() as directory:
+            pricing_dir = os.path.join(directory, 'pricing')
+            write_pricing_mirror(pricing_dir, [region], 1000)
+            pricing_host = start_pricing_server(pricing_dir)
+            runs = {
+                'sync': [],
+                'async_collect': ['--async_collect'],
+                'chunk_size': ['--chunk_size', str(max(1, args.instances // 3))]
+            }
+            outputs = {name: run_main(endpoint_url, pricing_host, directory, name, extra_args) for name, extra_args in runs.items()}
+    finally:
+        server.stop()
+
+    if any(output_df is None for output_df in outputs.values()):
+        sys.exit(1)
+    sync_df = outputs['sync']
+    print(f"sync: {len(sync_df)} instances, current {sync_df['current_monthly_storage_cost'].sum():.2f}, gp3 {sync_df['gp3_monthly_storage_cost'].sum():.2f}")
+    failed = False
+    for name, output_df in outputs.items():
+        if name == 'sync':
+            continue
+        try:
+            pd.testing.assert_frame_equal(sync_df, output_df[sync_df.columns], check_dtype=False)
+            print(f'{name}: same output as sync')
+        except AssertionError as e:
+            print(f'{name}: output differs from sync\n{e}')
+            failed = True
+    if failed or len(sync_df) != args.instances:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# simulated AWS backend for offline benchmarks: STS, EC2 regions, RDS inventory and CloudWatch metrics
+# clients carry botocore event emitters so the rate limiters and api counters of the run stay in the loop
+from botocore.exceptions import ClientError
+from botocore.hooks import HierarchicalEmitter
+from datetime import datetime, timedelta, timezone
+import random
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+from benchmarks.synthetic import engines
+
+class Simulatedaws(object):
+
+    service_ids = {'sts': 'sts', 'ec2': 'ec2', 'rds': 'rds', 'cloudwatch': 'cloudwatch'}
+
+    def __init__(self, accounts, regions, instances_per_region, latency_ms=None, throttle_rate=0.0, page_size=100, seed=0):
+        self.accounts = accounts
+        self.regions = regions
+        self.instances_per_region = instances_per_region
+        # per service latency in milliseconds, e.g. {'cloudwatch': 50}
+        self.latency_ms = latency_ms or {}
+        self.throttle_rate = throttle_rate
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.throttles = {}
+
+    def session(self, region_name=None, aws_access_key_id=None, aws_secret_access_key=None, aws_session_token=None, botocore_session=None):
+        # stands in for boto3.Session in the client registry, a botocore session brings its (refreshable) credentials
+        if botocore_session is not None:
+            return Simulatedsession(self, credentials=botocore_session.get_credentials())
+        return Simulatedsession(self, aws_access_key_id or 'caller')
+
+    def count(self, counters, service):
+        with self.lock:
+            counters[service] = counters.get(service, 0) + 1
+
+    def should_throttle(self):
+        with self.lock:
+            return self.random.random() < self.throttle_rate
+
+    def get_account(self, access_key):
+        # assumed role keys are AK<account id>, the default principal is the first account
+        return access_key[2:] if access_key.startswith('AK') else self.accounts[0]
+
+    def make_instance(self, account_id, region, index):
+        storage_type = ['io1', 'io1', 'io1', 'gp2', 'gp3'][index % 5]
+        dbinstance = {
+            'DBInstanceIdentifier': f'db-{account_id}-{region}-{index}',
+            'DBInstanceClass': 'db.r5.large',
+            'DBName': 'app',
+            'Engine': engines[index % len(engines)],
+            'MultiAZ': index % 3 == 0,
+            'StorageType': storage_type,
+            'AllocatedStorage': [100, 200, 400, 500, 1000, 4000][index % 6]
+        }
+        if storage_type != 'gp2':
+            dbinstance['Iops'] = [3000, 5000, 12000, 20000, 40000][index % 5]
+        if storage_type == 'gp3':
+            dbinstance['StorageThroughput'] = 125
+        return dbinstance
+
+class Simulatedsession(object):
+
+    def __init__(self, backend, access_key=None, credentials=None):
+        self.backend = backend
+        self.credentials = credentials or SimpleNamespace(access_key=access_key)
+
+    def get_credentials(self):
+        return self.credentials
+
+    def client(self, service, region_name=None, config=None, endpoint_url=None):
+        return {
+            'sts': Simulatedsts,
+            'ec2': Simulatedec2,
+            'rds': Simulatedrds,
+            'cloudwatch': Simulatedcloudwatch
+        }[service](self.backend, self.backend.get_account(self.credentials.access_key), region_name, service)
+
+class Simulatedclient(object):
+    # one call: before-call, then per attempt before-send, simulated latency and throttling, needs-retry
+
+    max_attempts = 10
+
+    def __init__(self, backend, account_id, region, service):
+        self.backend = backend
+        self.account_id = account_id
+        self.region = region
+        self.service = service
+        service_id = backend.service_ids[service]
+        self.meta = SimpleNamespace(
+            events=HierarchicalEmitter(),
+            service_model=SimpleNamespace(service_name=service, service_id=SimpleNamespace(hyphenize=lambda: service_id)))
+
+    def call(self, operation, fn):
+        service_id = self.meta.service_model.service_id.hyphenize()
+        self.meta.events.emit(f'before-call.{service_id}.{operation}')
+        for attempt in range(1, self.max_attempts + 1):
+            self.meta.events.emit(f'before-send.{service_id}.{operation}')
+            self.backend.count(self.backend.calls, self.service)
+            time.sleep(self.backend.latency_ms.get(self.service, 0) / 1000)
+            if self.backend.should_throttle():
+                self.backend.count(self.backend.throttles, self.service)
+                error = {'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}}
+                self.meta.events.emit(f'needs-retry.{service_id}.{operation}', response=(None, error), attempts=attempt)
+                if attempt == self.max_attempts:
+                    raise ClientError(error, operation)
+                # standard mode backoff: random up to 2^attempt * 50ms, capped at 1s
+                time.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+                continue
+            response = fn()
+            self.meta.events.emit(f'needs-retry.{service_id}.{operation}', response=(None, response), attempts=attempt)
+            return response
+
+class Simulatedsts(Simulatedclient):
+
+    def assume_role(self, RoleArn, RoleSessionName):
+        account_id = RoleArn.split(':')[4]
+        credentials = {'AccessKeyId': f'AK{account_id}', 'SecretAccessKey': 'secret', 'SessionToken': f'token-{account_id}',
+                       'Expiration': datetime.now(timezone.utc) + timedelta(hours=1)}
+        return self.call('AssumeRole', lambda: {'Credentials': credentials})
+
+    def get_caller_identity(self):
+        return self.call('GetCallerIdentity', lambda: {'Account': self.account_id, 'Arn': f'arn:aws:iam::{self.account_id}:user/benchmark'})
+
+class Simulatedec2(Simulatedclient):
+
+    def describe_regions(self, **kwargs):
+        return self.call('DescribeRegions', lambda: {'Regions': [{'RegionName': region} for region in self.backend.regions]})
+
+class Simulatedrds(Simulatedclient):
+
+    def describe_db_instances(self, Marker=None, **kwargs):
+        start = int(Marker or 0)
+        end = min(start + self.backend.page_size, self.backend.instances_per_region)
+        def page():
+            response = {'DBInstances': [self.backend.make_instance(self.account_id, self.region, index) for index in range(start, end)]}
+            if end < self.backend.instances_per_region:
+                response['Marker'] = str(end)
+            return response
+        return self.call('DescribeDBInstances', page)
+
+    def get_paginator(self, operation):
+        return SimpleNamespace(paginate=self.paginate)
+
+    def paginate(self, **kwargs):
+        marker = None
+        while True:
+            response = self.describe_db_instances(Marker=marker)
+            yield response
+            marker = response.get('Marker')
+            if marker is None:
+                break
+
+class Simulatedcloudwatch(Simulatedclient):
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, ScanBy=None, NextToken=None, **kwargs):
+        def results():
+            metric_results = []
+            start = StartTime.replace(tzinfo=timezone.utc)
+            for query in MetricDataQueries:
+                period = query['MetricStat']['Period']
+                points = max(1, min(int((EndTime - StartTime).total_seconds() // period), 2016))
+                # deterministic usage level per query, newest datapoint first
+                level = 100.0 + (zlib.crc32(query['MetricStat']['Metric']['Dimensions'][0]['Value'].encode()) % 5000)
+                timestamps = [start + timedelta(seconds=period * i) for i in range(points)][::-1]
+                values = [level * (1 + (i % 12) / 12) for i in range(points)]
+                metric_results.append({'Id': query['Id'], 'Timestamps': timestamps, 'Values': values, 'StatusCode': 'Complete'})
+            return {'MetricDataResults': metric_results}
+        return self.call('GetMetricData', results)
@@ -0,0 +1,65 @@
+# synthetic stand-ins for the RDS bulk price list and instance inventory used by the benchmarks
+import numpy as np
+import pandas as pd
+
+storage_prices = {
+    'PIOPS-Storage': 0.125,
+    'PIOPS': 0.10,
+    'GP3-Storage': 0.115,
+    'GP3-PIOPS': 0.02,
+    'GP3-Throughput': 0.08,
+    'Multi-AZ-PIOPS-Storage': 0.25,
+    'Multi-AZ-PIOPS': 0.20,
+    'Multi-AZ-GP3-Storage': 0.23,
+    'Multi-AZ-GP3-PIOPS': 0.04,
+    'Multi-AZ-GP3-Throughput': 0.16
+}
+
+engines = ['postgres', 'mysql', 'mariadb', 'sqlserver-se', 'sqlserver-ee', 'oracle-ee', 'oracle-se2']
+
+def make_pricing_df(rows=300000, seed=0):
+    # mostly instance-hour rows with the storage usage types placed at the end, like the real file
+    rng = np.random.default_rng(seed)
+    instance_classes = np.array([f'db.{family}.{size}' for family in ['m5', 'r5', 'r6g', 't3', 'x2g'] for size in ['large', 'xlarge', '2xlarge', '4xlarge']])
+    filler = rows - len(storage_prices)
+    usage_types = np.char.add('USE2-InstanceUsage:', rng.choice(instance_classes, filler))
+    pricing_df = pd.DataFrame({
+        'SKU': [f'SKU{i:08d}' for i in range(rows)],
+        'TermType': 'OnDemand',
+        'PriceDescription': 'synthetic price',
+        'Unit': 'Hrs',
+        'PricePerUnit': np.concatenate([rng.uniform(0.01, 20.0, filler).round(4), list(storage_prices.values())]),
+        'Currency': 'USD',
+        'ProductFamily': 'Database Instance',
+        'Location': 'US East (Ohio)',
+        'DeploymentOption': 'Single-AZ',
+        'usageType': np.concatenate([usage_types, [f'USE2-RDS:{usage}' for usage in storage_prices]]),
+        'operation': 'CreateDBInstance'
+    })
+    return pricing_df
+
+def make_instance_df(count, seed=0):
+    rng = np.random.default_rng(seed)
+    storage_iops = rng.choice([1000, 3000, 5000, 12000, 20000, 40000, 64000, 80000], count)
+    instance_df = pd.DataFrame({
+        'instance': [f'db-{i}' for i in range(count)],
+        'region': 'us-east-2',
+        'instance_type': 'db.r5.large',
+        'db': 'app',
+        'engine': rng.choice(engines + ['docdb'], count),
+        'multi_az': rng.random(count) < 0.4,
+        'storage_type': rng.choice(['io1', 'io1', 'io1', 'gp2', 'gp3'], count),
+        'storage_size': rng.choice([100, 200, 300, 400, 500, 1000, 4000], count),
+        'storage_throughput': np.nan,
+        'storage_iops': storage_iops.astype(float)
+    })
+    return instance_df
+
+def write_pricing_csv(path, rows=300000, extra_columns=40, seed=0):
+    # bulk price list csv layout: 5 preamble lines, header names with spaces and many descriptive columns
+    pricing_df = make_pricing_df(rows, seed).rename(columns={'ProductFamily': 'Product Family', 'DeploymentOption': 'Deployment Option'})
+    for i in range(extra_columns):
+        pricing_df[f'Attribute {i}'] = f'attribute value {i}'
+    with open(path, 'w') as f:
+        f.write('"FormatVersion","v1.0"\n"Disclaimer","synthetic"\n"Publication Date","2026-01-01T00:00:00Z"\n"Version","20260101000000"\n"OfferCode","AmazonRDS"\n')
+        pricing_df.to_csv(f, index=False)
@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import pandas as pd
+import time
+from classes.getdata import Getdata
+from classes.getinstanceinfo import Getinstanceinfo
+from classes.rightsizing import Rightsizing
+from classes.clientregistry import clients
+from classes.credentialcache import credentialcache
+from classes.runstats import runstats
+
+class Asynccollector(object):
+    # collects the RDS inventory and CloudWatch metrics for many account/region jobs on one event loop
+    # boto3 calls run in worker threads, each service has its own global concurrency limit
+
+    services = ['sts', 'rds', 'cloudwatch']
+    # run report stage of each service's calls, same names as the synchronous stages
+    stage_names = {'sts': 'sts_session', 'rds': 'describe_db_instances', 'cloudwatch': 'cloudwatch_usage'}
+
+    def __init__(self, args):
+        self.args = args
+        self.concurrency = args.async_concurrency
+        self.getinstanceinfo = Getinstanceinfo()
+        self.getdata = Getdata()
+        self.rightsizing = Rightsizing(args.rightsize_percentiles, args.rightsize_headroom)
+
+    async def call(self, service, fn, **kwargs):
+        async with self.semaphores[service]:
+            start = time.perf_counter()
+            try:
+                return await asyncio.to_thread(fn, **kwargs)
+            finally:
+                runstats.add_time(self.stage_names[service], time.perf_counter() - start)
+
+    async def get_session(self, job):
+        # region discovery already assumed the account's role, its session is passed with the job
+        if job.get('session') is not None:
+            return job['session']
+        if pd.isna(job.get('role_arn')):
+            return clients.get_session(job['region'])
+        # jobs of the same role share one session with refreshable credentials
+        sts = clients.get_client(clients.get_session(), 'sts', None, 'caller', self.args.endpoint_url)
+        return await self.call('sts', credentialcache.get_session, sts=sts, role_arn=job['role_arn'], account_id=job['account'], region=job['region'])
+
+    async def get_instance_list(self, session, region, account_id):
+        # describe_db_instances pagination with Marker, one page per call
+        rds = clients.get_client(session, 'rds', region, account_id, self.args.endpoint_url)
+        pages = []
+        request = {}
+        while True:
+            page = await self.call('rds', rds.describe_db_instances, **request)
+            pages.append(page)
+            if page.get('Marker') is None:
+                break
+            request['Marker'] = page['Marker']
+        return self.getinstanceinfo.build_instance_df(pages, region)
+
+    async def get_instance_usage(self, instance_df, session, region, account_id):
+        # every get_metric_data batch of up to 500 queries is its own concurrent call
+        if self.args.metric_cache is not None:
+            return await self.call('cloudwatch', self.getinstanceinfo.get_cached_instance_usage, instance_df=instance_df, args=self.args, session=session, region=region, account_id=account_id)
+        cw_client = clients.get_client(session, 'cloudwatch', region, account_id, self.args.endpoint_url)
+        metric_queries, start, end = self.getinstanceinfo.build_usage_queries(instance_df, self.args)
+        results = {}
+        batch_size = self.getdata.max_queries_per_call
+        await asyncio.gather(*[
+            self.call('cloudwatch', self.getdata.cw_rds_pull_metric_batch, cw_client=cw_client, batch=metric_queries[i:i + batch_size], start=start, end=end, results=results)
+            for i in range(0, len(metric_queries), batch_size)
+        ])
+        return self.getinstanceinfo.map_usage_results(instance_df, results)
+
+    async def collect_job(self, job):
+        # same instance_df schema as the synchronous collection in process_account_region
+        session = await self.get_session(job)
+        logging.info(f"Region is set to: {job['region']}, gathering RDS instance list for account: {job['account']}")
+        instance_df = await self.get_instance_list(session, job['region'], job['account'])
+        runstats.increment('instances_collected', len(instance_df))
+        if not instance_df.empty:
+            # with --rightsize the cw_storage_* statistics come from the same time series pull as the usage percentiles
+            if self.args.rightsize:
+                usage_df = await self.call('cloudwatch', self.rightsizing.get_usage_statistics, instance_df=instance_df, args=self.args, session=session, region=job['region'], account_id=job['account'])
+            else:
+                usage_df = await self.get_instance_usage(instance_df, session, job['region'], job['account'])
+            instance_df = self.getinstanceinfo.add_instance_usage(instance_df, usage_df, job['region'], job['account'])
+        return instance_df
+
+    async def collect_all(self, jobs):
+        # returns one instance_df or exception per job, in job order
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency * len(self.services)))
+        self.semaphores = {service: asyncio.Semaphore(self.concurrency) for service in self.services}
+        return await asyncio.gather(*[self.collect_job(job) for job in jobs], return_exceptions=True)
+
+    def collect(self, jobs):
+        return asyncio.run(self.collect_all(jobs))
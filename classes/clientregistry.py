@@ -0,0 +1,35 @@
+import boto3
+import threading
+from classes.ratelimiter import client_config, ratelimiters
+
+class Clientregistry(object):
+    # boto3 sessions and clients reused for the whole run, creating them loads endpoint and service models
+    # boto3 sessions are not thread-safe, so sessions and clients are only created under the lock
+
+    def __init__(self, session_factory=boto3.Session):
+        # session_factory builds the sessions, a simulated AWS backend can replace boto3.Session
+        self.session_factory = session_factory
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.clients = {}
+
+    def get_session(self, region=None, aws_access_key_id=None, aws_secret_access_key=None, aws_session_token=None):
+        # keyed by credentials, one session creates clients for any region
+        key = (aws_access_key_id, aws_session_token)
+        with self.lock:
+            if key not in self.sessions:
+                self.sessions[key] = self.session_factory(region_name=region, aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key, aws_session_token=aws_session_token)
+            return self.sessions[key]
+
+    def get_client(self, session, service, region, account_id, endpoint_url=None):
+        # keyed by (session, region, service), the client is attached to its account/region/service rate limiter
+        # sessions are per credentials or per role (refreshable credentials), so a refresh keeps using the same client
+        with self.lock:
+            key = (session, region, service, endpoint_url)
+            if key not in self.clients:
+                client = session.client(service, region_name=region, config=client_config, endpoint_url=endpoint_url)
+                self.clients[key] = ratelimiters.attach(client, account_id, region)
+            return self.clients[key]
+
+# process wide registry shared by all workers
+clients = Clientregistry()
@@ -0,0 +1,104 @@
+import logging
+import numpy as np
+import pandas as pd
+import traceback
+
+class Costengine(object):
+    # columnar version of the per-row cost functions in Getinstanceinfo, all rows are priced at once
+    # rows that cannot be priced get float NaN
+
+    # gp3 baseline iops and throughput (MiB/s) included in the storage price, per engine family
+    # (engines, size threshold GB, baseline at or below threshold, baseline above threshold, max iops above threshold)
+    engine_baselines = [
+        (['postgres', 'mysql', 'mariadb'], 400, (3000, 125, np.inf), (12000, 500, 64000)),
+        # mssql has no secondary/higher pricing baseline
+        (['sqlserver-se', 'sqlserver-ee', 'sqlserver'], np.inf, (3000, 125, 16000), (3000, 125, 16000)),
+        (['oracle-se', 'oracle-ee', 'oracle', 'oracle-se2'], 200, (3000, 125, np.inf), (12000, 500, 64000))
+    ]
+
+    def get_price(self, instance_df, pricing_index, component):
+        # per-row unit price for a storage component based on the deployment option
+        single_az = pricing_index.get(('Single-AZ', component), np.nan)
+        multi_az = pricing_index.get(('Multi-AZ', component), np.nan)
+        return np.where(instance_df['multi_az'].to_numpy() == True, multi_az, single_az)
+
+    def apply_discount(self, storage_cost, percent_discount):
+        # same rounding as Getinstanceinfo.round_up(storage_cost, 2)
+        if percent_discount is None:
+            return storage_cost
+        return np.ceil(storage_cost * (1.0 - percent_discount) * 100) / 100
+
+    def calc_io1_throughput(self, instance_df):
+        # assume 64K per IOP for io1
+        storage_iops = pd.to_numeric(instance_df['storage_iops'], errors='coerce').to_numpy(dtype=float)
+        is_io1 = (instance_df['storage_type'] == 'io1').to_numpy()
+        return pd.Series(np.where(is_io1, np.floor((storage_iops * 64) / 1024), np.nan), index=instance_df.index)
+
+    def get_gp3_baselines(self, instance_df):
+        # baseline iops, baseline throughput and max supported iops per row, NaN for unsupported engines
+        engine = instance_df['engine'].to_numpy()
+        storage_size = pd.to_numeric(instance_df['storage_size'], errors='coerce').to_numpy(dtype=float)
+        baseline_iops = np.full(len(instance_df), np.nan)
+        baseline_throughput = np.full(len(instance_df), np.nan)
+        max_iops = np.full(len(instance_df), np.nan)
+        for engines, size_threshold, small, large in self.engine_baselines:
+            is_engine = np.isin(engine, engines)
+            is_large = storage_size > size_threshold
+            for mask, (iops, throughput, iops_limit) in ((is_engine & ~is_large, small), (is_engine & is_large, large)):
+                baseline_iops[mask] = iops
+                baseline_throughput[mask] = throughput
+                max_iops[mask] = iops_limit
+        return baseline_iops, baseline_throughput, max_iops
+
+    def gp3_adjustments(self, instance_df):
+        # billable iops and throughput above the gp3 baseline
+        storage_iops = pd.to_numeric(instance_df['storage_iops'], errors='coerce').to_numpy(dtype=float)
+        storage_throughput = pd.to_numeric(instance_df['storage_throughput'], errors='coerce').to_numpy(dtype=float)
+        baseline_iops, baseline_throughput, max_iops = self.get_gp3_baselines(instance_df)
+
+        within_baseline = storage_iops <= baseline_iops
+        over_limit = storage_iops > max_iops
+        iops_adjusted = np.where(within_baseline, 0.0, storage_iops - baseline_iops)
+        # no nan_to_num here, a NaN throughput means nothing billable above baseline like the row-based path
+        throughput_excess = np.where(storage_throughput >= baseline_throughput, storage_throughput - baseline_throughput, 0.0)
+        throughput_adjusted = np.where(within_baseline, 0.0, throughput_excess)
+
+        unpriceable = over_limit | np.isnan(baseline_iops) | np.isnan(storage_iops)
+        iops_adjusted[unpriceable] = np.nan
+        throughput_adjusted[unpriceable] = np.nan
+        return iops_adjusted, throughput_adjusted
+
+    def calc_io1_costs(self, instance_df, pricing_index):
+        # undiscounted monthly io1 storage cost
+        storage_size = pd.to_numeric(instance_df['storage_size'], errors='coerce').to_numpy(dtype=float)
+        storage_iops = pd.to_numeric(instance_df['storage_iops'], errors='coerce').to_numpy(dtype=float)
+        gb_monthly_cost = storage_size * self.get_price(instance_df, pricing_index, 'PIOPS-Storage')
+        iops_monthly_cost = storage_iops * self.get_price(instance_df, pricing_index, 'PIOPS')
+        is_io1 = (instance_df['storage_type'] == 'io1').to_numpy()
+        return np.where(is_io1, gb_monthly_cost + iops_monthly_cost, np.nan)
+
+    def calc_gp3_costs(self, instance_df, pricing_index):
+        # undiscounted monthly gp3 storage cost with the same size, iops and throughput as io1
+        storage_size = pd.to_numeric(instance_df['storage_size'], errors='coerce').to_numpy(dtype=float)
+        iops_adjusted, throughput_adjusted = self.gp3_adjustments(instance_df)
+        gb_monthly_cost = storage_size * self.get_price(instance_df, pricing_index, 'GP3-Storage')
+        iops_monthly_cost = iops_adjusted * self.get_price(instance_df, pricing_index, 'GP3-PIOPS')
+        throughput_monthly_cost = throughput_adjusted * self.get_price(instance_df, pricing_index, 'GP3-Throughput')
+        is_io1 = (instance_df['storage_type'] == 'io1').to_numpy()
+        return np.where(is_io1, gb_monthly_cost + iops_monthly_cost + throughput_monthly_cost, np.nan)
+
+    def get_current_price(self, instance_df, pricing_index, args):
+        try:
+            storage_cost = self.apply_discount(self.calc_io1_costs(instance_df, pricing_index), args.percent_discount)
+            return pd.Series(storage_cost, index=instance_df.index)
+        except Exception as e: 
+            logging.error(f'An error occurred during io1 cost calculation')
+            traceback.print_exc()
+
+    def get_future_price(self, instance_df, pricing_index, args):
+        try:
+            storage_cost = self.apply_discount(self.calc_gp3_costs(instance_df, pricing_index), args.percent_discount)
+            return pd.Series(storage_cost, index=instance_df.index)
+        except Exception as e: 
+            logging.error(f'An error occurred during future gp3 cost calculation')
+            traceback.print_exc()
@@ -0,0 +1,59 @@
+import botocore.session
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+import logging
+import threading
+from classes.clientregistry import clients
+from classes.runstats import runstats
+
+class Rolecredentialprovider(CredentialProvider):
+    # botocore credential provider for one role, refreshed through the same assume_role call
+
+    METHOD = 'sts-assume-role'
+    CANONICAL_NAME = 'custom-sts-assume-role'
+
+    def __init__(self, fetch_credentials):
+        self.fetch_credentials = fetch_credentials
+
+    def load(self):
+        return RefreshableCredentials.create_from_metadata(metadata=self.fetch_credentials(), refresh_using=self.fetch_credentials, method=self.METHOD)
+
+class Credentialcache(object):
+    # one session per role arn with refreshable assumed-role credentials, shared by every region and worker
+    # botocore refreshes the credentials 15 minutes before they expire, so one assume_role call per role per validity window
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.role_locks = {}
+
+    def fetch_credentials(self, sts, role_arn, account_id):
+        logging.info(f"Assuming role: {role_arn} in account: {account_id}")
+        with runstats.stage('sts_assume_role'):
+            member_account = sts.assume_role(RoleArn=role_arn, RoleSessionName='rds-info-gathering')
+        runstats.increment('sts_assume_role_calls')
+        credentials = member_account['Credentials']
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat()
+        }
+
+    def get_session(self, sts, role_arn, account_id, region=None):
+        with self.lock:
+            role_lock = self.role_locks.setdefault(role_arn, threading.Lock())
+        with role_lock:
+            if role_arn in self.sessions:
+                runstats.increment('credential_cache_hits')
+                return self.sessions[role_arn]
+            botocore_session = botocore.session.get_session()
+            provider = Rolecredentialprovider(lambda: self.fetch_credentials(sts, role_arn, account_id))
+            botocore_session.get_component('credential_provider').insert_before('env', provider)
+            session = clients.session_factory(botocore_session=botocore_session, region_name=region)
+            # assume the role now, so a failure belongs to the job asking for the session
+            session.get_credentials()
+            self.sessions[role_arn] = session
+            return session
+
+# process wide assumed-role sessions
+credentialcache = Credentialcache()
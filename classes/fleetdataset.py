@@ -0,0 +1,79 @@
+import glob
+import logging
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+class Fleetdataset(object):
+    # fleet-wide output as a parquet dataset partitioned by account and region
+    # layout: <dataset_dir>/account_id=<account>/region=<region>/part-<part>.parquet
+
+    string_columns = ['instance', 'instance_type', 'db', 'engine', 'storage_type']
+    bool_columns = ['multi_az']
+    int_columns = ['storage_size']
+
+    # partition values are read back as strings, account ids keep their leading zeros
+    partitioning = ds.partitioning(pa.schema([('account_id', pa.string()), ('region', pa.string())]), flavor='hive')
+
+    def __init__(self, dataset_dir):
+        self.dataset_dir = dataset_dir
+
+    def get_partition_dir(self, account_id, region):
+        return os.path.join(self.dataset_dir, f'account_id={account_id}', f'region={region}')
+
+    def get_field_type(self, column):
+        if column in self.string_columns:
+            return pa.string()
+        if column in self.bool_columns:
+            return pa.bool_()
+        if column in self.int_columns:
+            return pa.int64()
+        return pa.float64()
+
+    def to_table(self, instance_df):
+        # explicit arrow types so every file of the dataset has the same numeric dtypes
+        table_df = instance_df.drop(columns=['account_id', 'region'], errors='ignore')
+        fields = []
+        for column in table_df.columns:
+            field_type = self.get_field_type(column)
+            if field_type == pa.string():
+                table_df[column] = table_df[column].astype(object).where(table_df[column].notna(), None)
+            elif field_type != pa.bool_():
+                table_df[column] = pd.to_numeric(table_df[column], errors='coerce')
+            fields.append(pa.field(column, field_type))
+        return pa.Table.from_pandas(table_df, schema=pa.schema(fields), preserve_index=False)
+
+    def write(self, instance_df, account_id, region, part=0):
+        partition_dir = self.get_partition_dir(account_id, region)
+        os.makedirs(partition_dir, exist_ok=True)
+        if part == 0:
+            # a new run of the job replaces every part it wrote before
+            for part_file in glob.glob(os.path.join(partition_dir, 'part-*.parquet')):
+                os.remove(part_file)
+        part_file = os.path.join(partition_dir, f'part-{part:05d}.parquet')
+        pq.write_table(self.to_table(instance_df), part_file + '.tmp')
+        os.replace(part_file + '.tmp', part_file)
+        logging.debug(f'Parquet part written to: {part_file}')
+
+    def aggregate(self, group_columns, batch_size=65536):
+        # savings totals per group, scanned in record batches so only the group totals are held in memory
+        dataset = ds.dataset(self.dataset_dir, format='parquet', partitioning=self.partitioning)
+        cost_columns = ['current_monthly_storage_cost', 'gp3_monthly_storage_cost']
+        priced = ds.field('current_monthly_storage_cost').is_valid() & ds.field('gp3_monthly_storage_cost').is_valid()
+        totals = None
+        for batch in dataset.to_batches(columns=group_columns + cost_columns, filter=priced, batch_size=batch_size):
+            if batch.num_rows == 0:
+                continue
+            batch_totals = batch.to_pandas().groupby(group_columns, dropna=False).agg(
+                instances=('current_monthly_storage_cost', 'size'),
+                old_cost=('current_monthly_storage_cost', 'sum'),
+                new_cost=('gp3_monthly_storage_cost', 'sum'))
+            totals = batch_totals if totals is None else totals.add(batch_totals, fill_value=0)
+        if totals is None:
+            return pd.DataFrame(columns=group_columns + ['instances', 'old_cost', 'new_cost', 'total_savings', 'percent_reduction'])
+        totals['instances'] = totals['instances'].astype('int64')
+        totals['total_savings'] = totals['old_cost'] - totals['new_cost']
+        totals['percent_reduction'] = (100 * totals['total_savings'] / totals['old_cost'].where(totals['old_cost'] > 0)).round(1)
+        return totals.reset_index()
@@ -3,14 +3,17 @@ from datetime import datetime, timedelta
 import logging
 import pandas as pd
 import math
-from random import randrange
 import traceback
+from classes.ratelimiter import apistats
 
 class Getdata(object):
 
+    # get_metric_data limit on MetricDataQueries per request
+    max_queries_per_call = 500
+
     def convert_bytes_to_gb(self, bytes_value):
         try:
-            if bytes_value == 0 or bytes_value == 'NaN':
+            if pd.isna(bytes_value) or bytes_value == 0 or bytes_value == 'NaN':
                 return 0
             i = int(math.floor(math.log(bytes_value, 1024)))
             p = math.pow(1024, i)
@@ -20,54 +23,71 @@ class Getdata(object):
             logging.error(f'An error occurred in converting bytes')
             traceback.print_exc()
 
-    def cw_rds_pull_metric(self, cw_client, metric_name, namespace, instance_name, instance, stat, period, args):
-            try:
-                logging.debug(f'Pulling cloudwatch data for instance: {instance} and metric: {metric_name}')
-                id_name = f'rdsmetricpull{randrange(1000000)}'
-                
-                if args.start_time and args.end_time is not None:
-                    start = args.start_time
-                    end = args.end_time
-                    # add in period_seconds calc
-                else:
-                    start = ((datetime.utcnow().replace(microsecond=0, second=0, minute=0) - timedelta(hours=1)) - timedelta(days=args.days_back))
-                    end = (datetime.utcnow().replace(microsecond=0, second=0, minute=0) - timedelta(hours=1))
-                    timespan = end - start 
-                    period_seconds = (60 * int(timespan.total_seconds() / 60 ))
+    def get_time_window(self, args):
+        # utc start and end time for the cloudwatch pull, period covers the whole window
+        if args.start_time is not None and args.end_time is not None:
+            start = datetime.strptime(args.start_time, '%Y-%m-%d %H:%M:%S')
+            end = datetime.strptime(args.end_time, '%Y-%m-%d %H:%M:%S')
+        else:
+            end = (datetime.utcnow().replace(microsecond=0, second=0, minute=0) - timedelta(hours=1))
+            start = end - timedelta(days=args.days_back)
+        timespan = end - start
+        period_seconds = (60 * int(timespan.total_seconds() / 60))
+        return start, end, period_seconds
 
-                cw_response = cw_client.get_metric_data(
-                    MetricDataQueries=[
+    def build_metric_query(self, query_id, metric_name, namespace, instance_name, instance, stat, period_seconds):
+        return {
+            'Id': query_id,
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': namespace,
+                    'MetricName': metric_name,
+                    'Dimensions': [
                         {
-                            'Id': id_name,
-                            'MetricStat': {
-                                'Metric': {
-                                    'Namespace': namespace,
-                                    'MetricName': metric_name,
-                                    'Dimensions': [
-                                        {
-                                            'Name': instance_name,
-                                            'Value': instance
-                                        },
-                                    ]
-                                },
-                                'Period': period_seconds,
-                                'Stat': stat,
-                            },
-                            'ReturnData': True
-                        }
-                    ],
-                    StartTime=start,
-                    EndTime=end,
-                    ScanBy='TimestampDescending'
-                )
+                            'Name': instance_name,
+                            'Value': instance
+                        },
+                    ]
+                },
+                'Period': period_seconds,
+                'Stat': stat,
+            },
+            'ReturnData': True
+        }
+
+    def cw_rds_pull_metric(self, cw_client, metric_queries, start, end):
+        # pack queries into as few get_metric_data calls as possible (max 500 per call)
+        # returns {query id: {'Timestamps': [...], 'Values': [...]}}, failed batches are left out
+        results = {}
+        for i in range(0, len(metric_queries), self.max_queries_per_call):
+            self.cw_rds_pull_metric_batch(cw_client, metric_queries[i:i + self.max_queries_per_call], start, end, results)
+        return results
 
-                logging.debug(f'CW Metric response: {cw_response["MetricDataResults"][0]}')
-                df_temp = pd.DataFrame(cw_response['MetricDataResults'][0])
-                if df_temp.empty:
-                    return 'NaN'
-                else: 
-                    return df_temp['Values'].iloc[0].round(decimals = 0)
-            except Exception as e: 
-                logging.error(f'An error occurred cloudwatch metric pull for {instance}')
-                traceback.print_exc()
-                return 'NaN'
\ No newline at end of file
+    def cw_rds_pull_metric_batch(self, cw_client, batch, start, end, results):
+        # one get_metric_data request of up to 500 queries, following NextToken pages
+        # the pages are merged into results only once the last one succeeded, a failed batch leaves no partial series
+        batch_results = {}
+        try:
+            logging.debug(f'Pulling cloudwatch data for {len(batch)} metric queries')
+            request = dict(
+                MetricDataQueries=batch,
+                StartTime=start,
+                EndTime=end,
+                ScanBy='TimestampDescending'
+            )
+            while True:
+                cw_response = cw_client.get_metric_data(**request)
+                for metric_result in cw_response['MetricDataResults']:
+                    result = batch_results.setdefault(metric_result['Id'], {'Timestamps': [], 'Values': []})
+                    result['Timestamps'].extend(metric_result.get('Timestamps', []))
+                    result['Values'].extend(metric_result.get('Values', []))
+                next_token = cw_response.get('NextToken')
+                if next_token is None:
+                    break
+                request['NextToken'] = next_token
+            results.update(batch_results)
+        except Exception as e: 
+            logging.error(f'An error occurred cloudwatch metric pull for queries {batch[0]["Id"]} to {batch[-1]["Id"]}')
+            apistats.increment('cloudwatch', 'failed_metric_pulls', len(batch))
+            traceback.print_exc()
+        return results
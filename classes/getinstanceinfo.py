@@ -1,25 +1,82 @@
-import boto3
-from botocore.config import Config
+import io
 import logging
 import pandas as pd
 import numpy as np
 import math
 import traceback
+import urllib.request
+from datetime import datetime, timezone
 from classes.getdata import Getdata
+from classes.metricstore import Metricstore
+from classes.clientregistry import clients
+from classes.runstats import Countingstream, runstats
 
 class Getinstanceinfo(object):
 
+    # cloudwatch metrics pulled per instance and the output column each one fills
+    metric_list = [
+        {
+            'metric_name':'FreeStorageSpace',
+            'namespace': 'AWS/RDS',
+            'instance_name': 'DBInstanceIdentifier',
+            'stat':'Minimum',
+            'column': 'cw_storage_free'
+        },
+        {
+            'metric_name':'WriteIOPS',
+            'namespace': 'AWS/RDS',
+            'instance_name': 'DBInstanceIdentifier',
+            'stat':'p98.00',
+            'column': 'cw_storage_write_iops'
+        },
+        {
+            'metric_name':'ReadIOPS',
+            'namespace': 'AWS/RDS',
+            'instance_name': 'DBInstanceIdentifier',
+            'stat':'p98.00',
+            'column': 'cw_storage_read_iops'
+        },
+        {
+            'metric_name':'WriteThroughput',
+            'namespace': 'AWS/RDS',
+            'instance_name': 'DBInstanceIdentifier',
+            'stat':'p98.00',
+            'column': 'cw_storage_write_throughput'
+        },
+        {
+            'metric_name':'ReadThroughput',
+            'namespace': 'AWS/RDS',
+            'instance_name': 'DBInstanceIdentifier',
+            'stat':'p98.00',
+            'column': 'cw_storage_read_throughput'
+        }
+    ]
+
+    # storage related usageType suffixes kept in the pricing index, multi-az adds a 'Multi-AZ-' prefix
+    storage_components = ['PIOPS-Storage', 'PIOPS', 'GP3-Storage', 'GP3-PIOPS', 'GP3-Throughput']
+
     def get_account_info(self, args):
         try:
-            account_id = boto3.client('sts').get_caller_identity().get('Account')
-            account_arn = boto3.client('sts').get_caller_identity().get('Arn')
-            gen = boto3.client('sts').get_caller_identity()
+            sts = clients.get_client(clients.get_session(), 'sts', None, 'caller', args.endpoint_url)
+            caller_identity = sts.get_caller_identity()
+            account_id = caller_identity.get('Account')
+            account_arn = caller_identity.get('Arn')
             return account_id, account_arn
         except Exception as e: 
             logging.error(f'An error occurred getting account ID and Role ARN')
             traceback.print_exc()
             return 'unknown-account'
 
+    def get_enabled_regions(self, args, session, account_id):
+        # regions enabled for the account: opt-in not required or opted in
+        try:
+            ec2 = clients.get_client(session, 'ec2', args.region or 'us-east-1', account_id, args.endpoint_url)
+            response = ec2.describe_regions(Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}])
+            return sorted(region['RegionName'] for region in response['Regions'])
+        except Exception as e:
+            logging.error(f'An error occurred discovering enabled regions for account: {account_id}')
+            traceback.print_exc()
+
     def round_up(self, n, decimals):
         try:
             multiplier = 10 ** decimals
@@ -28,132 +85,252 @@ class Getinstanceinfo(object):
             logging.error(f'An error occurred with math rounding')
             traceback.print_exc()
 
-    def get_instance_list(self, args, session, region):
+    def get_instance_list(self, args, session, region, account_id):
         # gather details of RDS instance deployed in the region
         try:
-            dtypes = np.dtype(
-                [
-                    ('instance', str),
-                    ('region', str),
-                    ('instance_type', str),
-                    ('db', str),
-                    ('engine', str),
-                    ('multi_az', bool),
-                    ('storage_type', str),
-                    ('storage_size', int),
-                    ('storage_throughput', int),
-                    ('storage_iops', int)
-                ]
-            )
-            instance_df = pd.DataFrame(np.empty(0, dtype=dtypes))
-
-            rds = session.client('rds', region_name=region)
+            rds = clients.get_client(session, 'rds', region, account_id, args.endpoint_url)
             paginator = rds.get_paginator('describe_db_instances').paginate()
-            for page in paginator:
-                for dbinstance in page['DBInstances']:
-                    logging.info(f'Found instance: {dbinstance.get("DBInstanceIdentifier")}')
-                    if 'DBClusterIdentifier' in dbinstance:
-                        logging.info(f'Skipping as instance is part of Multi-AZ Cluster or Aurora')
-                        continue
-                    row_dict = {'instance' : dbinstance.get('DBInstanceIdentifier', 'NaN'), \
-                        'region' : args.region, \
-                        'instance_type' : dbinstance.get('DBInstanceClass'), \
-                        'db' : dbinstance.get('DBName', 'NaN'), \
-                        'engine' : dbinstance.get('Engine', 'NaN'), \
-                        'multi_az' : dbinstance.get('MultiAZ', 'NaN'), \
-                        'storage_type' : dbinstance.get('StorageType', 'NaN'), \
-                        'storage_size' : dbinstance.get('AllocatedStorage', 'NaN'), \
-                        'storage_throughput' : dbinstance.get('StorageThroughput', 'NaN'), \
-                        'storage_iops' : dbinstance.get('Iops', 'NaN') \
-                        }
-                    temp_df = pd.DataFrame([row_dict])
-                    instance_df = pd.concat([instance_df, temp_df], ignore_index=True)
-            logging.debug(f'RDS Instance list {instance_df}')
-            return instance_df
+            return self.build_instance_df(paginator, region)
         except Exception as e: 
             logging.error(f'An error occurred during instance info gathering')
             traceback.print_exc()
 
-    def get_instance_usage(self, row, args, session, region):
+    def build_instance_record(self, dbinstance, region):
+        logging.info(f'Found instance: {dbinstance.get("DBInstanceIdentifier")}')
+        if 'DBClusterIdentifier' in dbinstance:
+            logging.info(f'Skipping as instance is part of Multi-AZ Cluster or Aurora')
+            return None
+        return {'instance' : dbinstance.get('DBInstanceIdentifier', 'NaN'), \
+            'region' : region, \
+            'instance_type' : dbinstance.get('DBInstanceClass'), \
+            'db' : dbinstance.get('DBName', 'NaN'), \
+            'engine' : dbinstance.get('Engine', 'NaN'), \
+            'multi_az' : dbinstance.get('MultiAZ', False), \
+            'storage_type' : dbinstance.get('StorageType', 'NaN'), \
+            'storage_size' : dbinstance.get('AllocatedStorage', 'NaN'), \
+            'storage_throughput' : dbinstance.get('StorageThroughput', 'NaN'), \
+            'storage_iops' : dbinstance.get('Iops', 'NaN') \
+            }
+
+    # instance DataFrame columns and dtypes, low cardinality strings are categorical
+    instance_dtypes = {
+        'instance': object,
+        'region': 'category',
+        'instance_type': 'category',
+        'db': object,
+        'engine': 'category',
+        'multi_az': bool,
+        'storage_type': 'category',
+        'storage_size': 'float64',
+        'storage_throughput': 'float64',
+        'storage_iops': 'float64'
+    }
+
+    def build_instance_df(self, pages, region):
+        # instance DataFrame from describe_db_instances response pages
+        # rows are buffered as column lists and the DataFrame is built once, linear in instance count
+        columns = {column: [] for column in self.instance_dtypes}
+        for page in pages:
+            for dbinstance in page['DBInstances']:
+                row_dict = self.build_instance_record(dbinstance, region)
+                if row_dict is None:
+                    continue
+                for column, values in columns.items():
+                    values.append(row_dict[column])
+
+        # missing numeric values become float NaN
+        for column in ['storage_size', 'storage_throughput', 'storage_iops']:
+            columns[column] = pd.to_numeric(pd.Series(columns[column], dtype=object), errors='coerce')
+        instance_df = pd.DataFrame(columns).astype(self.instance_dtypes)
+        logging.debug(f'RDS Instance list {instance_df}')
+        return instance_df
+
+    def iter_instance_chunks(self, args, session, region, account_id, chunk_size):
+        # stream describe_db_instances pages as instance DataFrames of about chunk_size rows
+        rds = clients.get_client(session, 'rds', region, account_id, args.endpoint_url)
+        buffer = []
+        for page in rds.get_paginator('describe_db_instances').paginate():
+            buffer.extend(page['DBInstances'])
+            if len(buffer) >= chunk_size:
+                yield self.build_instance_df([{'DBInstances': buffer}], region)
+                buffer = []
+        if buffer:
+            yield self.build_instance_df([{'DBInstances': buffer}], region)
+
+    def build_usage_queries(self, instance_df, args):
+        # query ids are stable and unique: m<row position>_<metric position>
+        getdata = Getdata()
+        start, end, period_seconds = getdata.get_time_window(args)
+        metric_queries = []
+        for row_pos, instance in enumerate(instance_df['instance']):
+            for metric_pos, item in enumerate(self.metric_list):
+                query_id = f'm{row_pos}_{metric_pos}'
+                metric_queries.append(getdata.build_metric_query(query_id, item['metric_name'], item['namespace'], item['instance_name'], instance, item['stat'], period_seconds))
+        return metric_queries, start, end
+
+    def map_usage_results(self, instance_df, results):
+        # single period covers the window, newest datapoint first
+        usage = {}
+        for metric_pos, item in enumerate(self.metric_list):
+            column = []
+            for row_pos in range(len(instance_df)):
+                values = results.get(f'm{row_pos}_{metric_pos}', {}).get('Values', [])
+                column.append(round(values[0]) if values else np.nan)
+            usage[item['column']] = column
+        return pd.DataFrame(usage, index=instance_df.index, dtype=float)
+
+    def add_instance_usage(self, instance_df, usage_df, region, account_id):
+        # a failed metric pull leaves the usage columns empty, the instances are still priced
+        if usage_df is None:
+            logging.error(f'No usage data for account: {account_id} in region {region}, continuing without usage metrics')
+            usage_df = pd.DataFrame(np.nan, index=instance_df.index, columns=[item['column'] for item in self.metric_list])
+        instance_df[usage_df.columns] = usage_df
+        return instance_df
+
+    def get_instance_usage(self, instance_df, args, session, region, account_id):
+        # pull all metrics for all instances in the region with batched get_metric_data calls
+        if args.metric_cache is not None:
+            return self.get_cached_instance_usage(instance_df, args, session, region, account_id)
         try:
             getdata = Getdata()
-        
-            # boto3 client config
-            config = Config(
-                retries = dict(
-                    max_attempts = 10
-                )
-            )
-
-            cw_client = session.client('cloudwatch', region_name=region, config=config)
-
-            metric_dict = [
-                {
-                    'metric_name':'FreeStorageSpace',
-                    'namespace': 'AWS/RDS',
-                    'instance_name': 'DBInstanceIdentifier',
-                    'stat':'Minimum',
-                    'period':86400
-                },
-                {
-                    'metric_name':'WriteIOPS',
-                    'namespace': 'AWS/RDS',
-                    'instance_name': 'DBInstanceIdentifier',
-                    'stat':'p98.00',
-                    'period':86400
-                },
-                {
-                    'metric_name':'ReadIOPS',
-                    'namespace': 'AWS/RDS',
-                    'instance_name': 'DBInstanceIdentifier',
-                    'stat':'p98.00',
-                    'period':86400
-                },
-                {
-                    'namespace': 'AWS/RDS',
-                    'instance_name': 'DBInstanceIdentifier',
-                    'metric_name':'WriteThroughput',
-                    'stat':'p98.00',
-                    'period':86400
-                },
-                {
-                    'namespace': 'AWS/RDS',
-                    'instance_name': 'DBInstanceIdentifier',
-                    'metric_name':'ReadThroughput',
-                    'stat':'p98.00',
-                    'period':86400
-                }
-            ]
-            result_list = []
-
-            for item in metric_dict:
-                val = getdata.cw_rds_pull_metric(cw_client, item['metric_name'], item['namespace'], item['instance_name'], row.instance, item['stat'], item['period'], args)
-                result_list.append(val)
-
-            return result_list[0], result_list[1], result_list[2], result_list[3], result_list[4]
+            cw_client = clients.get_client(session, 'cloudwatch', region, account_id, args.endpoint_url)
+            metric_queries, start, end = self.build_usage_queries(instance_df, args)
+            runstats.increment('metric_queries', len(metric_queries))
+            results = getdata.cw_rds_pull_metric(cw_client, metric_queries, start, end)
+            return self.map_usage_results(instance_df, results)
         except Exception as e: 
-            logging.error(f'An error occurred during instance info gathering')
+            logging.error(f'An error occurred during instance usage gathering')
             traceback.print_exc()
     
-    def get_instance_pricing_data(self, region):
+    def aggregate_hourly(self, hourly_values, stat):
+        # window statistic from hourly statistics
+        # the percentile of hourly percentiles is an approximation, it usually overstates the window percentile
+        # because every hour contributes its own busiest datapoints, the sizing errs on the high side
+        if stat == 'Minimum':
+            return hourly_values.min()
+        if stat == 'Maximum':
+            return hourly_values.max()
+        if stat.startswith('p'):
+            return hourly_values.quantile(float(stat[1:]) / 100)
+        return hourly_values.mean()
+
+    def get_cached_instance_usage(self, instance_df, args, session, region, account_id):
+        # fetch only the hours missing from the local metric store, then compute the window statistics from stored hours
+        metricstore = Metricstore(args.metric_cache)
+        try:
+            getdata = Getdata()
+            start, end, period_seconds = getdata.get_time_window(args)
+            start_hour = int(start.replace(tzinfo=timezone.utc).timestamp() // 3600)
+            end_hour = int(end.replace(tzinfo=timezone.utc).timestamp() // 3600)
+
+            # only this instance_df's rows, with --chunk_size other chunks of the region keep their hours
+            instances = instance_df['instance'].tolist()
+            if args.refresh_metrics:
+                metricstore.delete_window(account_id, region, instances, start_hour, end_hour)
+            stored_hours = metricstore.get_stored_hours(account_id, region, instances, start_hour, end_hour)
+
+            # group instance/metric pairs by missing hour ranges, on daily runs every instance misses the same newest hours
+            missing_groups = {}
+            for row_pos, instance in enumerate(instance_df['instance']):
+                for metric_pos, item in enumerate(self.metric_list):
+                    hours = stored_hours.get((instance, item['metric_name'], item['stat']), set())
+                    for missing_range in metricstore.get_missing_ranges(hours, start_hour, end_hour):
+                        missing_groups.setdefault(missing_range, []).append((row_pos, metric_pos, instance, item))
+
+            fetched = 0
+            settled_hour = metricstore.get_settled_hour()
+            for (range_start, range_end), pairs in missing_groups.items():
+                cw_client = clients.get_client(session, 'cloudwatch', region, account_id, args.endpoint_url)
+                metric_queries = [getdata.build_metric_query(f'm{row_pos}_{metric_pos}', item['metric_name'], item['namespace'], item['instance_name'], instance, item['stat'], 3600) \
+                    for row_pos, metric_pos, instance, item in pairs]
+                results = getdata.cw_rds_pull_metric(cw_client, metric_queries, datetime.fromtimestamp(range_start * 3600, timezone.utc), datetime.fromtimestamp(range_end * 3600, timezone.utc))
+
+                rows = []
+                for row_pos, metric_pos, instance, item in pairs:
+                    # queries from failed batches are not stored, so they are fetched again on the next run
+                    result = results.get(f'm{row_pos}_{metric_pos}')
+                    if result is None:
+                        continue
+                    hourly = {int(timestamp.timestamp()) // 3600: value for timestamp, value in zip(result['Timestamps'], result['Values'])}
+                    # recent hours without a datapoint may still get one, they are left out instead of stored as NULL
+                    rows.extend((account_id, region, instance, item['metric_name'], item['stat'], hour, hourly.get(hour)) for hour in range(range_start, range_end) \
+                        if hour in hourly or hour < settled_hour)
+                metricstore.store(rows)
+                fetched += len(rows)
+            logging.info(f'Metric cache for account: {account_id} region: {region} fetched {fetched} missing hourly values in {len(missing_groups)} time ranges')
+
+            values_df = metricstore.get_values(account_id, region, instances, start_hour, end_hour)
+            usage = {}
+            for item in self.metric_list:
+                item_df = values_df[(values_df['metric'] == item['metric_name']) & (values_df['stat'] == item['stat'])]
+                window_values = self.aggregate_hourly(item_df.groupby('instance')['value'], item['stat'])
+                usage[item['column']] = instance_df['instance'].map(window_values).round().to_numpy(dtype=float)
+            return pd.DataFrame(usage, index=instance_df.index, dtype=float)
+        except Exception as e: 
+            logging.error(f'An error occurred during cached instance usage gathering')
+            traceback.print_exc()
+        finally:
+            metricstore.close()
+
+    # price list columns kept by the pricing loader (header names without spaces)
+    pricing_columns = ['TermType', 'PriceDescription', 'Unit', 'PricePerUnit', 'Currency', 'ProductFamily', 'Location', 'DeploymentOption', 'usageType']
+
+    def get_instance_pricing_data(self, region, version='current', pricing_host='https://pricing.us-east-1.amazonaws.com'):
         try:
-            pricing_csv = f'https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonRDS/current/{region}/index.csv'
-            pricing_df = pd.read_csv(pricing_csv, skiprows=5)
-            pricing_df.columns = pricing_df.columns.str.replace(' ', '')
-            return pricing_df
+            pricing_csv = f'{pricing_host}/offers/v1.0/aws/AmazonRDS/{version}/{region}/index.csv'
+            with urllib.request.urlopen(pricing_csv) as response:
+                return self.read_pricing_csv(io.BufferedReader(Countingstream(response, runstats, 'pricing_bytes_downloaded')))
         except Exception as e: 
             logging.error(f'An error occurred during bulk pricing pull')
             traceback.print_exc()
 
-    def calc_io_costs(self, row, rds_pricing_df, storage_gb, storage_iops, args):
+    def read_pricing_csv(self, pricing_csv, chunk_size=100000):
+        # parse the bulk price list in chunks, keeping only the needed columns and the storage usage types
+        chunks = []
+        reader = pd.read_csv(pricing_csv, skiprows=5, usecols=lambda column: column.replace(' ', '') in self.pricing_columns, \
+            dtype=str, chunksize=chunk_size)
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.replace(' ', '')
+            chunks.append(chunk[chunk['usageType'].str.endswith(tuple(self.storage_components), na=False)])
+            runstats.increment('pricing_rows_read', len(chunk))
+        pricing_df = pd.concat(chunks, ignore_index=True)
+        runstats.increment('pricing_rows_kept', len(pricing_df))
+        pricing_df['PricePerUnit'] = pricing_df['PricePerUnit'].astype('float64')
+        string_columns = [column for column in pricing_df.columns if column != 'PricePerUnit']
+        pricing_df[string_columns] = pricing_df[string_columns].astype('category')
+        logging.debug(f'Pricing rows kept: {len(pricing_df)}')
+        return pricing_df
+
+    def build_pricing_index(self, rds_pricing_df):
+        # reduce the regional price list once to {(deployment option, storage component): unit price}
+        try:
+            # usageType is e.g. 'RDS:GP3-Storage' or 'USE2-RDS:Multi-AZ-GP3-Storage'
+            storage_df = rds_pricing_df[rds_pricing_df['usageType'].astype(str).str.endswith(tuple(self.storage_components))]
+            usage_suffix = storage_df['usageType'].str.split(':').str[-1]
+            pricing_index = {}
+            for deployment, prefix in (('Single-AZ', ''), ('Multi-AZ', 'Multi-AZ-')):
+                for component in self.storage_components:
+                    prices = storage_df.loc[usage_suffix == prefix + component, 'PricePerUnit']
+                    if not prices.empty:
+                        pricing_index[(deployment, component)] = float(prices.iat[0])
+            logging.debug(f'Pricing index: {pricing_index}')
+            return pricing_index
+        except Exception as e: 
+            logging.error(f'An error occurred building the pricing index')
+            traceback.print_exc()
+
+    def get_deployment_option(self, row):
+        return 'Multi-AZ' if row.multi_az == True else 'Single-AZ'
+
+    def calc_io_costs(self, row, pricing_index, args):
+        deployment = self.get_deployment_option(row)
+
         # calculate monthly storage GB costs 
-        temp_df = rds_pricing_df[rds_pricing_df['usageType'].str.contains(storage_gb)]
-        per_unit = float(temp_df['PricePerUnit'].iat[0])
+        per_unit = pricing_index[(deployment, 'PIOPS-Storage')]
         gb_monthly_cost = float(row.storage_size) * per_unit
 
         # calculate monthly storage IOPS costs 
-        temp_df = rds_pricing_df[rds_pricing_df['usageType'].str.contains(storage_iops)]
-        per_unit = float(temp_df['PricePerUnit'].iat[0])
+        per_unit = pricing_index[(deployment, 'PIOPS')]
         iops_monthly_cost = float(row.storage_iops) * per_unit
 
         storage_cost = gb_monthly_cost + iops_monthly_cost
@@ -166,7 +343,7 @@ class Getinstanceinfo(object):
 
         return storage_cost
 
-    def calc_io1_throughput(self, row, rds_pricing_df, args):
+    def calc_io1_throughput(self, row, args):
         try:
             logging.debug(f'Calculating throughput for based on io1 iops')
             if row.storage_type == 'io1':
@@ -180,17 +357,13 @@ class Getinstanceinfo(object):
             traceback.print_exc()
             return 'NaN'
 
-    def get_current_price(self, row, rds_pricing_df, args):
+    def get_current_price(self, row, pricing_index, args):
         try:
             logging.debug(f'Found instance with storage type of: {row.storage_type}')
             if row.storage_type == 'io1':
                 # future - need to add functionality for Multi-AZ deployment with two readable standby instances
-                if row.multi_az == True:
-                    logging.debug(f'Found multi AZ instance')
-                    return self.calc_io_costs(row, rds_pricing_df, ':Multi-AZ-PIOPS-Storage', ':Multi-AZ-PIOPS', args)
-                if row.multi_az == False:
-                    logging.debug(f'Found single Az instance')
-                    return self.calc_io_costs(row, rds_pricing_df, ':PIOPS-Storage', ':PIOPS', args)
+                logging.debug(f'Found {self.get_deployment_option(row)} instance')
+                return self.calc_io_costs(row, pricing_index, args)
             else:
                 return 'NaN'
         except Exception as e: 
@@ -261,7 +434,8 @@ class Getinstanceinfo(object):
             traceback.print_exc()
             return 'NaN'
 
-    def calc_gp3_costs(self, row, rds_pricing_df, storage_gb, storage_iops, storage_throughput, args):
+    def calc_gp3_costs(self, row, pricing_index, args):
+        deployment = self.get_deployment_option(row)
 
         # make adjustments for 
         storage_iops_adjusted, storage_throughput_adjusted = self.gp3_adjustments(row)
@@ -269,23 +443,20 @@ class Getinstanceinfo(object):
         logging.debug(f'Adjusted storage iops and throughput numbers: {storage_iops_adjusted}, {storage_throughput_adjusted}')
 
         # calculate monthly storage GB costs 
-        temp_df = rds_pricing_df[rds_pricing_df['usageType'].str.contains(storage_gb)]
-        per_unit = float(temp_df['PricePerUnit'].iat[0])
+        per_unit = pricing_index[(deployment, 'GP3-Storage')]
         gb_monthly_cost = float(row.storage_size) * per_unit
         logging.debug(f'GB monthly cost: {gb_monthly_cost}')
 
         # calculate monthly storage IOPS costs 
-        temp_df = rds_pricing_df[rds_pricing_df['usageType'].str.contains(storage_iops)]
-        per_unit = float(temp_df['PricePerUnit'].iat[0])
-        # consider 3000 built in for baseline cost
-        iops_monthly_cost = float(int(storage_iops_adjusted) - 3000) * per_unit
-        logging.debug(f'IOPS monthly cost: {gb_monthly_cost}')
+        per_unit = pricing_index[(deployment, 'GP3-PIOPS')]
+        # adjusted iops are already above the engine baseline included in the gp3 price
+        iops_monthly_cost = float(storage_iops_adjusted) * per_unit
+        logging.debug(f'IOPS monthly cost: {iops_monthly_cost}')
 
         # calculate monthly storage Throughput costs 
-        temp_df = rds_pricing_df[rds_pricing_df['usageType'].str.contains(storage_throughput)]
-        per_unit = float(temp_df['PricePerUnit'].iat[0])
+        per_unit = pricing_index[(deployment, 'GP3-Throughput')]
 
-        if isinstance(storage_throughput_adjusted, int):
+        if storage_throughput_adjusted != 'NaN':
             throughput_monthly_cost = float(storage_throughput_adjusted) * per_unit
             logging.debug(f'Throughput monthly cost: {throughput_monthly_cost}')
 
@@ -299,16 +470,12 @@ class Getinstanceinfo(object):
 
         return storage_cost
 
-    def get_future_price(self, row, rds_pricing_df, args):
+    def get_future_price(self, row, pricing_index, args):
         try:
             if row.storage_type == 'io1':
                 # future - need to add functionality for Multi-AZ deployment with two readable standby instances
-                if row.multi_az == True:
-                    logging.debug(f'Calculating gp3 costs based on multi-az storage')
-                    return self.calc_gp3_costs(row, rds_pricing_df, ':Multi-AZ-GP3-Storage', ':Multi-AZ-GP3-PIOPS', ':Multi-AZ-GP3-Throughput', args)
-                if row.multi_az == False:
-                    logging.debug(f'Calculating gp3 costs based on single-az storage')
-                    return self.calc_gp3_costs(row, rds_pricing_df, ':GP3-Storage', ':GP3-PIOPS', ':GP3-Throughput', args)
+                logging.debug(f'Calculating gp3 costs based on {self.get_deployment_option(row)} storage')
+                return self.calc_gp3_costs(row, pricing_index, args)
             else:
                 logging.debug(f'Instance is using gp3 future pricing calculation does not apply')
                 return 'NaN'
@@ -317,20 +484,29 @@ class Getinstanceinfo(object):
             traceback.print_exc()
             return 'NaN'
 
-    def gen_summary_statistics(self, instance_df):
-        try:
-            logging.debug(f'Summary statistics calculation')
-            instance_df.drop(instance_df[instance_df['storage_type'] != 'io1'].index, inplace = True)
-            instance_df.drop(instance_df[instance_df['current_monthly_storage_cost'] == 'NaN'].index, inplace = True)
-            instance_df.drop(instance_df[instance_df['gp3_monthly_storage_cost'] == 'NaN'].index, inplace = True)
+    def update_summary_statistics(self, summary, instance_df):
+        # keep io1 rows that could be priced and add them to the running totals in summary
+        instance_df = instance_df[instance_df['storage_type'] == 'io1'].dropna(subset=['current_monthly_storage_cost', 'gp3_monthly_storage_cost'])
+        summary['instances'] = summary.get('instances', 0) + len(instance_df)
+        summary['old_cost'] = summary.get('old_cost', 0.0) + instance_df['current_monthly_storage_cost'].sum()
+        summary['new_cost'] = summary.get('new_cost', 0.0) + instance_df['gp3_monthly_storage_cost'].sum()
+        return instance_df
 
-            old_cost = instance_df['current_monthly_storage_cost'].sum()
-            new_cost = instance_df['gp3_monthly_storage_cost'].sum()
-
-            total_savings = old_cost - new_cost
-            logging.info(f'Prior io1 total cost: {old_cost}, converted gp3 total cost: {new_cost}')
+    def log_summary_statistics(self, summary):
+        old_cost = summary.get('old_cost', 0.0)
+        new_cost = summary.get('new_cost', 0.0)
+        total_savings = old_cost - new_cost
+        logging.info(f'Prior io1 total cost: {old_cost}, converted gp3 total cost: {new_cost}')
+        if old_cost > 0:
             percent_reduction = int(abs((100 * float(new_cost)/float(old_cost))-100))
             logging.info(f'Total gp3 savings in USD: {total_savings}, gives a percent reduction of: {percent_reduction}')
+
+    def gen_summary_statistics(self, instance_df):
+        try:
+            logging.debug(f'Summary statistics calculation')
+            summary = {}
+            instance_df = self.update_summary_statistics(summary, instance_df)
+            self.log_summary_statistics(summary)
             return instance_df
         except Exception as e: 
             logging.error(f'An error occurred during summary statistics calculation')
@@ -0,0 +1,100 @@
+import logging
+import os
+import pandas as pd
+import sqlite3
+import time
+
+class Metricstore(object):
+    # local sqlite store of hourly cloudwatch statistics keyed by account, region, instance, metric, stat and hour
+    # hours that were fetched without a datapoint are stored with a NULL value so they are not fetched again
+    # cloudwatch datapoints can arrive late, hours newer than settle_hours are fetched again on every run and never stored as NULL
+    settle_hours = 3
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # one connection per caller, WAL lets concurrent workers read while one of them writes
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS metric_hours (
+                account TEXT NOT NULL,
+                region TEXT NOT NULL,
+                instance TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                stat TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                value REAL,
+                PRIMARY KEY (account, region, instance, metric, stat, hour)
+            ) WITHOUT ROWID
+        ''')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def get_settled_hour(self):
+        # first hour that is still fetched again on every run
+        return int(time.time() // 3600) - self.settle_hours
+
+    def set_instances(self, instances):
+        # the instances queries are limited to, e.g. one --chunk_size chunk, kept in a temp table so any number of them fits one statement
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS query_instances (instance TEXT PRIMARY KEY)')
+        with self.connection:
+            self.connection.execute('DELETE FROM query_instances')
+            self.connection.executemany('INSERT OR IGNORE INTO query_instances VALUES (?)', ((instance,) for instance in instances))
+
+    def get_stored_hours(self, account_id, region, instances, start_hour, end_hour):
+        # {(instance, metric, stat): set of stored hours} for settled hours in [start_hour, end_hour)
+        end_hour = min(end_hour, self.get_settled_hour())
+        self.set_instances(instances)
+        stored_hours = {}
+        cursor = self.connection.execute(
+            'SELECT instance, metric, stat, hour FROM metric_hours WHERE account = ? AND region = ? AND instance IN (SELECT instance FROM query_instances) AND hour >= ? AND hour < ?',
+            (account_id, region, start_hour, end_hour))
+        for instance, metric, stat, hour in cursor:
+            stored_hours.setdefault((instance, metric, stat), set()).add(hour)
+        return stored_hours
+
+    def get_values(self, account_id, region, instances, start_hour, end_hour):
+        self.set_instances(instances)
+        values_df = pd.read_sql_query(
+            'SELECT instance, metric, stat, hour, value FROM metric_hours WHERE account = ? AND region = ? AND instance IN (SELECT instance FROM query_instances) AND hour >= ? AND hour < ? AND value IS NOT NULL',
+            self.connection, params=(account_id, region, start_hour, end_hour))
+        # an empty result has object columns
+        values_df['value'] = values_df['value'].astype('float64')
+        return values_df
+
+    def store(self, rows):
+        # rows of (account, region, instance, metric, stat, hour, value)
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO metric_hours VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def delete_window(self, account_id, region, instances, start_hour, end_hour):
+        self.set_instances(instances)
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM metric_hours WHERE account = ? AND region = ? AND instance IN (SELECT instance FROM query_instances) AND hour >= ? AND hour < ?',
+                (account_id, region, start_hour, end_hour))
+
+    def evict(self, retention_days):
+        # drop hours older than the retention period
+        oldest_hour = int(time.time() // 3600) - int(retention_days * 24)
+        with self.connection:
+            deleted = self.connection.execute('DELETE FROM metric_hours WHERE hour < ?', (oldest_hour,)).rowcount
+        logging.info(f'Metric cache eviction removed {deleted} hourly values older than {retention_days} days')
+
+    def get_missing_ranges(self, hours, start_hour, end_hour):
+        # contiguous [start, end) hour ranges in the window that are not stored yet
+        missing_ranges = []
+        range_start = None
+        for hour in range(start_hour, end_hour):
+            if hour not in hours:
+                if range_start is None:
+                    range_start = hour
+            elif range_start is not None:
+                missing_ranges.append((range_start, hour))
+                range_start = None
+        if range_start is not None:
+            missing_ranges.append((range_start, end_hour))
+        return tuple(missing_ranges)
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import pandas as pd
+import threading
+import time
+import traceback
+import urllib.request
+from classes.getinstanceinfo import Getinstanceinfo
+from classes.runstats import runstats
+
+class Pricingcache(object):
+
+    pricing_host = 'https://pricing.us-east-1.amazonaws.com'
+    region_index_path = '/offers/v1.0/aws/AmazonRDS/current/region_index.json'
+
+    def __init__(self, cache_dir='cache/pricing', ttl_hours=24, offline=False, pricing_host=None):
+        self.cache_dir = cache_dir
+        self.pricing_host = pricing_host or self.pricing_host
+        self.ttl_seconds = ttl_hours * 3600
+        self.offline = offline
+        # pricing indexes already built during this run and their offer versions, keyed by region
+        self.memory = {}
+        self.versions = {}
+        self.region_index = None
+        self.region_index_loaded = 0
+        # one lock per region so concurrent workers load each region only once
+        self.lock = threading.Lock()
+        self.region_locks = {}
+        # region_index.json is fetched under its own lock, lookups of loaded regions never wait for the download
+        self.region_index_lock = threading.Lock()
+
+    def load_region_index(self):
+        # region_index.json is small and lists the current offer version url per region
+        # e.g. /offers/v1.0/aws/AmazonRDS/20230221190936/us-east-1/index.json
+        # reloaded after the ttl, a long running process (serve.py) picks up new offer versions
+        with self.region_index_lock:
+            if self.region_index is None or time.time() - self.region_index_loaded >= self.ttl_seconds:
+                with urllib.request.urlopen(self.pricing_host + self.region_index_path) as response:
+                    self.region_index = json.load(response)
+                self.region_index_loaded = time.time()
+            return self.region_index
+
+    def get_offer_version(self, region):
+        version_url = self.load_region_index()['regions'][region]['currentVersionUrl']
+        return version_url.split('/')[5]
+
+    def get_regions(self):
+        # regions with an rds price list, only the cached regions when offline or when region_index.json is unavailable
+        if not self.offline:
+            try:
+                return set(self.load_region_index()['regions'])
+            except Exception as e:
+                logging.warning(f'Could not load the pricing region index, only cached regions are known')
+        cached_regions = {file[:-len('.json')] for file in os.listdir(self.cache_dir) if file.endswith('.json')} if os.path.isdir(self.cache_dir) else set()
+        return cached_regions | set(self.memory)
+
+    def read_metadata(self, region):
+        meta_file = os.path.join(self.cache_dir, f'{region}.json')
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file) as f:
+            meta = json.load(f)
+        if not os.path.exists(meta['file']):
+            return None
+        return meta
+
+    def write_metadata(self, region, meta):
+        # write to a temp file and rename so a crash never leaves a half written file
+        meta_file = os.path.join(self.cache_dir, f'{region}.json')
+        with open(f'{meta_file}.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(f'{meta_file}.tmp', meta_file)
+
+    def download(self, region, version):
+        getinstanceinfo = Getinstanceinfo()
+        with runstats.stage('pricing_download'):
+            pricing_df = getinstanceinfo.get_instance_pricing_data(region, version, self.pricing_host)
+        if pricing_df is None:
+            return None, None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_file = os.path.join(self.cache_dir, f'{region}_{version}.pkl')
+        pricing_df.to_pickle(f'{cache_file}.tmp', compression=None)
+        os.replace(f'{cache_file}.tmp', cache_file)
+        return pricing_df, cache_file
+
+    def check_metadata(self, region):
+        # cached metadata, checked against the current offer version once the ttl has passed and downloaded if newer
+        # returns (meta, source, pricing_df), pricing_df is only set by a download
+        meta = self.read_metadata(region)
+        if self.offline:
+            if meta is None:
+                logging.error(f'Offline mode and no cached pricing data for region: {region}')
+                return None, None, None
+            return meta, 'cache (offline)', None
+        if meta is not None and time.time() - meta['checked_at'] < self.ttl_seconds:
+            return meta, 'cache (within ttl)', None
+
+        pricing_df = None
+        try:
+            version = self.get_offer_version(region)
+        except Exception as e:
+            if meta is None:
+                raise
+            logging.warning(f'Could not check pricing offer version for {region}, using cached version: {meta["version"]}')
+            version = meta['version']
+        if meta is not None and meta['version'] == version:
+            source = 'cache (version unchanged)'
+        else:
+            logging.info(f'Downloading pricing offer version {version} for region: {region}')
+            pricing_df, cache_file = self.download(region, version)
+            if pricing_df is None:
+                return None, None, None
+            old_file = meta['file'] if meta is not None else None
+            meta = {'region': region, 'version': version, 'file': cache_file}
+            source = 'download'
+            if old_file is not None and old_file != cache_file and os.path.exists(old_file):
+                os.remove(old_file)
+        meta['checked_at'] = time.time()
+        self.write_metadata(region, meta)
+        return meta, source, pricing_df
+
+    def get_pricing_data(self, region, loaded_version=None):
+        # (pricing_df, version), pricing_df is None when loading failed or when loaded_version is still the current version
+        try:
+            load_start = time.perf_counter()
+            meta, source, pricing_df = self.check_metadata(region)
+            if meta is None:
+                return None, None
+            if pricing_df is None:
+                if meta['version'] == loaded_version:
+                    return None, loaded_version
+                with runstats.stage('pricing_cache_read'):
+                    pricing_df = pd.read_pickle(meta['file'], compression=None)
+
+            logging.info(f'Pricing data for {region} (version {meta["version"]}) loaded from {source} in {time.perf_counter() - load_start:.2f}s')
+            return pricing_df, meta['version']
+        except Exception as e:
+            logging.error(f'An error occurred loading cached pricing data for region: {region}')
+            traceback.print_exc()
+            return None, None
+
+    def get_pricing_index(self, region):
+        # only the small storage price index is kept in memory, the full price list is released
+        with self.lock:
+            region_lock = self.region_locks.setdefault(region, threading.Lock())
+        with region_lock:
+            if region not in self.memory:
+                pricing_df, version = self.get_pricing_data(region)
+                if pricing_df is None:
+                    return None
+                with runstats.stage('pricing_filter'):
+                    self.memory[region] = Getinstanceinfo().build_pricing_index(pricing_df)
+                self.versions[region] = version
+            return self.memory[region]
+
+    def refresh_pricing_index(self, region):
+        # rebuild a region's index when there is a newer offer version (checked once the ttl has passed) and swap it in
+        # readers keep getting the old index while the new one is built
+        loaded_version = self.versions.get(region)
+        pricing_df, version = self.get_pricing_data(region, loaded_version)
+        if version is None:
+            return False
+        if pricing_df is None:
+            logging.debug(f'Pricing offer version {version} for {region} unchanged, index kept')
+            return True
+        pricing_index = Getinstanceinfo().build_pricing_index(pricing_df)
+        if pricing_index is None:
+            return False
+        with self.lock:
+            region_lock = self.region_locks.setdefault(region, threading.Lock())
+        with region_lock:
+            self.memory[region] = pricing_index
+            self.versions[region] = version
+        return True
@@ -0,0 +1,160 @@
+from collections import deque
+import logging
+import numpy as np
+import pandas as pd
+import threading
+import time
+import traceback
+from types import SimpleNamespace
+from classes.costengine import Costengine
+
+class Pricingservice(object):
+    # io1 and gp3 storage estimates from warm regional pricing indexes, refreshed in a background thread
+    # batches are priced with the same Costengine functions as main.py
+
+    # request item fields and defaults, storage_throughput defaults to the io1 estimate of main.py
+    item_defaults = {
+        'region': None,
+        'engine': 'postgres',
+        'multi_az': False,
+        'storage_type': 'io1',
+        'storage_size': np.nan,
+        'storage_iops': np.nan,
+        'storage_throughput': None
+    }
+    # json types accepted per request item field, bool is not accepted as a number
+    text_fields = ['region', 'engine', 'storage_type']
+    number_fields = ['storage_size', 'storage_iops', 'storage_throughput']
+
+    def __init__(self, pricing_cache, regions, refresh_minutes=60, latency_window=1000):
+        self.pricing_cache = pricing_cache
+        self.regions = list(regions)
+        self.refresh_seconds = refresh_minutes * 60
+        self.costengine = Costengine()
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'items': 0, 'errors': 0, 'index_hits': 0, 'index_misses': 0, 'refreshes': 0, 'failed_refreshes': 0}
+        # latencies of the last latency_window requests in milliseconds
+        self.latencies = deque(maxlen=latency_window)
+        # regions with a price list, requests for other regions are rejected instead of loading pricing again
+        self.known_regions = set()
+        self.last_refresh = None
+        self.started = time.time()
+        self.stop_event = threading.Event()
+
+    def increment(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] += value
+
+    def warm(self):
+        self.known_regions = self.pricing_cache.get_regions()
+        for region in self.regions:
+            if self.pricing_cache.get_pricing_index(region) is None:
+                logging.error(f'No pricing data available for region {region}, it is loaded again on request')
+        self.last_refresh = time.time()
+        logging.info(f"Pricing indexes warm for regions: {', '.join(self.regions)}")
+
+    def refresh(self):
+        # every warm region, including regions first loaded on request
+        self.known_regions = self.pricing_cache.get_regions()
+        for region in list(self.pricing_cache.memory):
+            if self.pricing_cache.refresh_pricing_index(region):
+                self.increment('refreshes')
+            else:
+                self.increment('failed_refreshes')
+        self.last_refresh = time.time()
+
+    def refresh_loop(self):
+        while not self.stop_event.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f'An error occurred refreshing the pricing indexes')
+                traceback.print_exc()
+
+    def start_refresh(self):
+        thread = threading.Thread(target=self.refresh_loop, name='pricing-refresh', daemon=True)
+        thread.start()
+        return thread
+
+    def get_pricing_index(self, region):
+        if region in self.pricing_cache.memory:
+            self.increment('index_hits')
+        else:
+            self.increment('index_misses')
+        return self.pricing_cache.get_pricing_index(region)
+
+    def validate_items(self, items):
+        # first problem of a request's items as a message, None when every item can be priced
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                return f'item {position} must be an object'
+            for field in self.text_fields:
+                if field in item and not isinstance(item[field], str):
+                    return f'item {position}: {field} must be a string'
+            for field in self.number_fields:
+                if item.get(field) is not None and (isinstance(item[field], bool) or not isinstance(item[field], (int, float))):
+                    return f'item {position}: {field} must be a number'
+            if 'multi_az' in item and not isinstance(item['multi_az'], bool):
+                return f'item {position}: multi_az must be true or false'
+            if item.get('region') not in self.known_regions:
+                return f"item {position}: unknown region {item.get('region')!r}"
+        return None
+
+    def price(self, items, percent_discount=None):
+        # [{region, engine, multi_az, storage_type, storage_size, storage_iops, storage_throughput}] -> items with monthly costs
+        start = time.perf_counter()
+        try:
+            instance_df = pd.DataFrame([{field: item.get(field, default) for field, default in self.item_defaults.items()} for item in items],
+                                       columns=list(self.item_defaults))
+            instance_df['multi_az'] = instance_df['multi_az'].astype(bool)
+            throughput = pd.to_numeric(instance_df['storage_throughput'], errors='coerce')
+            instance_df['storage_throughput'] = throughput.fillna(self.costengine.calc_io1_throughput(instance_df))
+
+            args = SimpleNamespace(percent_discount=percent_discount)
+            current_cost = np.full(len(instance_df), np.nan)
+            future_cost = np.full(len(instance_df), np.nan)
+            for region, positions in instance_df.groupby('region').indices.items():
+                pricing_index = self.get_pricing_index(region)
+                if pricing_index is None:
+                    continue
+                region_df = instance_df.iloc[positions]
+                current_cost[positions] = self.costengine.get_current_price(region_df, pricing_index, args).to_numpy()
+                future_cost[positions] = self.costengine.get_future_price(region_df, pricing_index, args).to_numpy()
+
+            results = []
+            for item, current, future in zip(items, current_cost, future_cost):
+                result = dict(item)
+                result['current_monthly_storage_cost'] = None if np.isnan(current) else float(current)
+                result['gp3_monthly_storage_cost'] = None if np.isnan(future) else float(future)
+                result['monthly_savings'] = None if np.isnan(current) or np.isnan(future) else round(float(current - future), 2)
+                results.append(result)
+            self.increment('requests')
+            self.increment('items', len(items))
+            return results
+        except Exception as e:
+            self.increment('errors')
+            raise
+        finally:
+            with self.lock:
+                self.latencies.append((time.perf_counter() - start) * 1000)
+
+    def metrics(self):
+        with self.lock:
+            counters = dict(self.counters)
+            latencies = np.array(self.latencies)
+        lookups = counters['index_hits'] + counters['index_misses']
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'regions': sorted(self.pricing_cache.memory),
+            'last_refresh': self.last_refresh,
+            'counters': counters,
+            'index_hit_rate': counters['index_hits'] / lookups if lookups else None,
+            'latency_ms': {
+                'window': len(latencies),
+                'mean': float(latencies.mean()) if len(latencies) else None,
+                'p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'p95': float(np.percentile(latencies, 95)) if len(latencies) else None,
+                'p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+                'max': float(latencies.max()) if len(latencies) else None
+            }
+        }
@@ -0,0 +1,135 @@
+from botocore.config import Config
+import logging
+import threading
+import time
+
+class Apistats(object):
+    # thread-safe api counters per service for the run summary
+
+    counter_names = ['calls', 'requests', 'retries', 'throttles', 'failed_metric_pulls']
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def increment(self, service, counter, value=1):
+        with self.lock:
+            service_counters = self.counters.setdefault(service, dict.fromkeys(self.counter_names, 0))
+            service_counters[counter] += value
+
+    def summary(self):
+        with self.lock:
+            return {service: dict(service_counters) for service, service_counters in self.counters.items()}
+
+    def log_summary(self):
+        for service, service_counters in sorted(self.summary().items()):
+            logging.info(f'API summary for {service}: ' + ', '.join(f'{name}: {value}' for name, value in service_counters.items()))
+        failed = sum(service_counters['failed_metric_pulls'] for service_counters in self.summary().values())
+        if failed:
+            logging.warning(f'{failed} CloudWatch metric queries failed, results are incomplete for those instances')
+
+class Ratelimiter(object):
+    # client-side token bucket for one (account, region, service)
+    # the rate halves on every throttling response and recovers slowly on successful responses
+
+    throttle_codes = ['Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+                      'TooManyRequestsException', 'RequestLimitExceeded', 'RequestThrottled', 'SlowDown',
+                      'PriorRequestNotComplete', 'LimitExceededException']
+
+    def __init__(self, service, rate, burst, stats, min_rate=0.5):
+        self.service = service
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.tokens = burst
+        self.stats = stats
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # blocks until a token is available
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            logging.debug(f'Throttled by {self.service}, rate lowered to {self.rate:.2f} requests/s')
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    # botocore event handlers, they must return None so the request and retry handling are unchanged
+    def before_call(self, **kwargs):
+        self.stats.increment(self.service, 'calls')
+
+    def before_send(self, **kwargs):
+        self.acquire()
+        self.stats.increment(self.service, 'requests')
+
+    def needs_retry(self, response=None, attempts=None, **kwargs):
+        if attempts is not None and attempts > 1:
+            self.stats.increment(self.service, 'retries')
+        if response is None:
+            return
+        error_code = response[1].get('Error', {}).get('Code')
+        if error_code in self.throttle_codes:
+            self.stats.increment(self.service, 'throttles')
+            self.on_throttle()
+        elif error_code is None:
+            self.on_success()
+
+    def attach(self, client):
+        service_id = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register(f'before-call.{service_id}', self.before_call)
+        client.meta.events.register(f'before-send.{service_id}', self.before_send)
+        client.meta.events.register(f'needs-retry.{service_id}', self.needs_retry)
+        return client
+
+class Ratelimiterregistry(object):
+    # one shared limiter per (account, region, service) for the whole run
+
+    def __init__(self, stats, rate=20, burst=10):
+        self.stats = stats
+        self.rate = rate
+        self.burst = burst
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def configure(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+
+    def get(self, account_id, region, service):
+        with self.lock:
+            key = (account_id, region, service)
+            if key not in self.limiters:
+                self.limiters[key] = Ratelimiter(service, self.rate, self.burst, self.stats)
+            return self.limiters[key]
+
+    def attach(self, client, account_id, region):
+        service = client.meta.service_model.service_name
+        return self.get(account_id, region, service).attach(client)
+
+# botocore retries throttled calls with backoff, the limiters lower the request rate when that happens
+client_config = Config(
+    retries = dict(
+        mode = 'standard',
+        max_attempts = 10
+    )
+)
+
+# process wide counters and limiters, shared by every client created during the run
+apistats = Apistats()
+ratelimiters = Ratelimiterregistry(apistats)
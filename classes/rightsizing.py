@@ -0,0 +1,197 @@
+import logging
+import math
+import numpy as np
+import pandas as pd
+import traceback
+import warnings
+from datetime import datetime, timezone
+from classes.costengine import Costengine
+from classes.getdata import Getdata
+from classes.getinstanceinfo import Getinstanceinfo
+from classes.clientregistry import clients
+
+class Rightsizing(object):
+    # gp3 iops and throughput recommendations from the per-period read + write usage of each instance
+    # the time series are pulled in batches and reduced to percentile and peak statistics with numpy per batch
+
+    # (metric_name, stat, usage) time series per instance, read + write are summed per period into total iops and total throughput
+    metric_list = [
+        ('FreeStorageSpace', 'Minimum', None),
+        ('ReadIOPS', 'Average', 'iops'),
+        ('WriteIOPS', 'Average', 'iops'),
+        ('ReadThroughput', 'Average', 'throughput'),
+        ('WriteThroughput', 'Average', 'throughput')
+    ]
+
+    # rds gp3 limits: max throughput in MiB/s and max throughput per provisioned iops
+    max_throughput = 4000
+    max_throughput_per_iops = 0.25
+
+    def __init__(self, percentiles, headroom):
+        self.percentiles = [float(percentile) for percentile in percentiles]
+        self.headroom = headroom
+        self.costengine = Costengine()
+        self.getdata = Getdata()
+
+    def percentile_label(self, percentile):
+        return f'p{percentile:g}'
+
+    def get_period_seconds(self, start):
+        # cloudwatch keeps 1 minute datapoints for 15 days, 5 minute datapoints for 63 days and hourly datapoints for 455 days
+        # the resolution depends on how long ago the window starts, not on its length (start is naive utc like get_time_window)
+        return 300 if (datetime.utcnow() - start).days < 63 else 3600
+
+    def build_series_queries(self, instance_df, row_positions, period_seconds):
+        # query ids: r<row position>_<metric position>
+        metric_queries = []
+        for row_pos in row_positions:
+            instance = instance_df['instance'].iat[row_pos]
+            for metric_pos, (metric_name, stat, usage) in enumerate(self.metric_list):
+                metric_queries.append(self.getdata.build_metric_query(f'r{row_pos}_{metric_pos}', metric_name, 'AWS/RDS', 'DBInstanceIdentifier', instance, stat, period_seconds))
+        return metric_queries
+
+    def to_epoch(self, timestamp):
+        return (timestamp if timestamp.tzinfo is not None else timestamp.replace(tzinfo=timezone.utc)).timestamp()
+
+    def get_epochs(self, timestamps, period_seconds):
+        # datapoints are unique, period aligned and sorted, so a series without gaps spans exactly (n - 1) periods
+        # and only its first and last timestamp are converted, series with gaps convert every timestamp
+        first = self.to_epoch(timestamps[0])
+        if len(timestamps) == 1:
+            return np.array([first])
+        last = self.to_epoch(timestamps[-1])
+        step = (last - first) / (len(timestamps) - 1)
+        if abs(step) == period_seconds:
+            return first + step * np.arange(len(timestamps))
+        return np.array([self.to_epoch(timestamp) for timestamp in timestamps])
+
+    def build_series_matrix(self, results, row_positions, metric_pos, start_epoch, period_seconds, periods):
+        # rows x periods matrix of one metric, NaN for periods without a datapoint
+        matrix = np.full((len(row_positions), periods), np.nan)
+        for matrix_row, row_pos in enumerate(row_positions):
+            result = results.get(f'r{row_pos}_{metric_pos}', {})
+            if not result.get('Values'):
+                continue
+            epochs = self.get_epochs(result['Timestamps'], period_seconds)
+            slots = ((epochs - start_epoch) // period_seconds).astype(int)
+            valid = (slots >= 0) & (slots < periods)
+            matrix[matrix_row, slots[valid]] = np.asarray(result['Values'], dtype=float)[valid]
+        return matrix
+
+    def build_usage_matrix(self, series, usage):
+        # read + write usage per period, NaN for periods without any datapoint
+        matrices = [matrix for (metric_name, stat, metric_usage), matrix in zip(self.metric_list, series) if metric_usage == usage]
+        missing = np.logical_and.reduce([np.isnan(matrix) for matrix in matrices])
+        matrix = np.sum([np.nan_to_num(matrix) for matrix in matrices], axis=0)
+        matrix[missing] = np.nan
+        return matrix
+
+    def calc_window_statistics(self, series):
+        # cw_storage_* columns of get_instance_usage from the same series, minimum of the per-period minimums is exact,
+        # the p98 is taken over the per-period averages and so is somewhat lower than the cloudwatch p98 of the raw datapoints
+        window_items = {item['metric_name']: item for item in Getinstanceinfo.metric_list}
+        statistics = {}
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for (metric_name, stat, usage), matrix in zip(self.metric_list, series):
+                item = window_items[metric_name]
+                if item['stat'] == 'Minimum':
+                    values = np.nanmin(matrix, axis=1)
+                else:
+                    values = np.nanpercentile(matrix, float(item['stat'][1:]), axis=1)
+                statistics[item['column']] = np.round(values)
+        return statistics
+
+    def calc_usage_statistics(self, matrix):
+        # (percentiles x rows) percentile values and per-row peaks, all-NaN rows give NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            percentile_values = np.nanpercentile(matrix, self.percentiles, axis=1)
+            peak_values = np.nanmax(matrix, axis=1)
+        return percentile_values, peak_values
+
+    def get_usage_statistics(self, instance_df, args, session, region, account_id):
+        # usage_<percentile>_iops / _throughput (MiB/s), usage_peak_iops / _throughput and the cw_storage_* columns per instance
+        try:
+            cw_client = clients.get_client(session, 'cloudwatch', region, account_id, args.endpoint_url)
+            start, end, window_seconds = self.getdata.get_time_window(args)
+            period_seconds = self.get_period_seconds(start)
+            periods = math.ceil((end - start).total_seconds() / period_seconds)
+            start_epoch = start.replace(tzinfo=timezone.utc).timestamp()
+
+            statistics = {item['column']: np.full(len(instance_df), np.nan) for item in Getinstanceinfo.metric_list}
+            for usage in ['iops', 'throughput']:
+                for percentile in self.percentiles:
+                    statistics[f'usage_{self.percentile_label(percentile)}_{usage}'] = np.full(len(instance_df), np.nan)
+                statistics[f'usage_peak_{usage}'] = np.full(len(instance_df), np.nan)
+
+            # one get_metric_data batch of instances at a time, only that batch's time series are held in memory
+            instances_per_batch = self.getdata.max_queries_per_call // len(self.metric_list)
+            for batch_start in range(0, len(instance_df), instances_per_batch):
+                row_positions = range(batch_start, min(batch_start + instances_per_batch, len(instance_df)))
+                metric_queries = self.build_series_queries(instance_df, row_positions, period_seconds)
+                results = self.getdata.cw_rds_pull_metric(cw_client, metric_queries, start, end)
+                series = [self.build_series_matrix(results, row_positions, metric_pos, start_epoch, period_seconds, periods) for metric_pos in range(len(self.metric_list))]
+                for column, values in self.calc_window_statistics(series).items():
+                    statistics[column][batch_start:row_positions.stop] = values
+                for usage in ['iops', 'throughput']:
+                    matrix = self.build_usage_matrix(series, usage)
+                    if usage == 'throughput':
+                        # bytes/s to MiB/s like the gp3 throughput setting
+                        matrix = matrix / 1048576
+                    percentile_values, peak_values = self.calc_usage_statistics(matrix)
+                    for percentile, values in zip(self.percentiles, percentile_values):
+                        statistics[f'usage_{self.percentile_label(percentile)}_{usage}'][batch_start:row_positions.stop] = values
+                    statistics[f'usage_peak_{usage}'][batch_start:row_positions.stop] = peak_values
+            return pd.DataFrame(statistics, index=instance_df.index)
+        except Exception as e:
+            logging.error(f'An error occurred during rightsizing usage gathering')
+            traceback.print_exc()
+
+    def recommend(self, instance_df, pricing_index, args):
+        # cheapest gp3 iops / throughput covering each percentile of usage plus headroom, and its monthly cost
+        try:
+            storage_size = pd.to_numeric(instance_df['storage_size'], errors='coerce').to_numpy(dtype=float)
+            baseline_iops, baseline_throughput, max_iops = self.costengine.get_gp3_baselines(instance_df)
+            storage_price = self.costengine.get_price(instance_df, pricing_index, 'GP3-Storage')
+            iops_price = self.costengine.get_price(instance_df, pricing_index, 'GP3-PIOPS')
+            throughput_price = self.costengine.get_price(instance_df, pricing_index, 'GP3-Throughput')
+
+            for percentile in self.percentiles:
+                label = self.percentile_label(percentile)
+                # rows without usage statistics (e.g. a failed metric pull) get no recommendation
+                usage_df = instance_df.reindex(columns=[f'usage_{label}_iops', f'usage_{label}_throughput'])
+                required_iops = np.ceil(usage_df.iloc[:, 0].to_numpy(dtype=float) * (1 + self.headroom))
+                required_throughput = np.ceil(usage_df.iloc[:, 1].to_numpy(dtype=float) * (1 + self.headroom))
+
+                # the baselines are included in the storage price, extra throughput needs enough iops for the ratio limit
+                throughput = np.maximum(required_throughput, baseline_throughput)
+                iops = np.maximum(np.maximum(required_iops, baseline_iops), np.ceil(throughput / self.max_throughput_per_iops))
+
+                storage_cost = storage_size * storage_price + (iops - baseline_iops) * iops_price + (throughput - baseline_throughput) * throughput_price
+                unpriceable = (iops > max_iops) | (throughput > self.max_throughput) | np.isnan(iops) | np.isnan(throughput)
+                iops[unpriceable] = np.nan
+                throughput[unpriceable] = np.nan
+                storage_cost[unpriceable] = np.nan
+
+                instance_df[f'gp3_{label}_iops'] = iops
+                instance_df[f'gp3_{label}_throughput'] = throughput
+                instance_df[f'gp3_{label}_monthly_storage_cost'] = self.costengine.apply_discount(storage_cost, args.percent_discount)
+            return instance_df
+        except Exception as e:
+            logging.error(f'An error occurred during gp3 rightsizing')
+            traceback.print_exc()
+
+    def update_summary(self, summary, instance_df):
+        # add the rightsized costs of instance_df to the running totals in summary, e.g. one chunk at a time
+        for percentile in self.percentiles:
+            label = self.percentile_label(percentile)
+            costs = instance_df[f'gp3_{label}_monthly_storage_cost']
+            summary[f'{label}_cost'] = summary.get(f'{label}_cost', 0.0) + costs.sum()
+            summary[f'{label}_instances'] = summary.get(f'{label}_instances', 0) + int(costs.notna().sum())
+        return summary
+
+    def log_summary(self, summary):
+        for percentile in self.percentiles:
+            label = self.percentile_label(percentile)
+            logging.info(f"Rightsized gp3 ({label} usage, {self.headroom:.0%} headroom) total cost: {summary.get(f'{label}_cost', 0.0)} for {summary.get(f'{label}_instances', 0)} instances")
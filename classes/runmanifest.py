@@ -0,0 +1,49 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+class Runmanifest(object):
+    # records the status and output file of every (account, region) job of a sweep so it can be resumed
+    # the manifest is rewritten through a temp file and os.replace, readers never see a partial file
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                self.jobs = json.load(f)['jobs']
+            completed = sum(1 for job in self.jobs.values() if job['status'] == 'completed')
+            logging.info(f'Resuming from manifest: {path} with {completed} of {len(self.jobs)} jobs completed')
+
+    def job_key(self, account_id, region):
+        return f'{account_id}:{region}'
+
+    def is_completed(self, account_id, region):
+        with self.lock:
+            job = self.jobs.get(self.job_key(account_id, region))
+            return job is not None and job['status'] == 'completed'
+
+    def mark(self, account_id, region, status, output_file=None, error=None):
+        with self.lock:
+            self.jobs[self.job_key(account_id, region)] = {
+                'account': account_id,
+                'region': region,
+                'status': status,
+                'output_file': output_file,
+                'error': error,
+                'updated': datetime.now(timezone.utc).isoformat()
+            }
+            self.write()
+
+    def write(self):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, prefix='.manifest-', suffix='.tmp', delete=False) as f:
+            json.dump({'jobs': self.jobs}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f.name, self.path)
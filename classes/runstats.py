@@ -0,0 +1,132 @@
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime, timezone
+import io
+import json
+import logging
+import os
+import pstats
+try:
+    import resource
+except ImportError:
+    # unix only, the report has no peak rss on windows
+    resource = None
+import threading
+import time
+import tracemalloc
+
+class Runstats(object):
+    # thread-safe per-stage timers and run counters for the json run report
+    # stage seconds are summed over all workers, so with -w > 1 they can add up to more than the wall time
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.profiler = None
+        self.profile = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            stage = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += seconds
+            stage['max_seconds'] = max(stage['max_seconds'], seconds)
+
+    def increment(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def summary(self):
+        with self.lock:
+            return {
+                'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                'counters': dict(self.counters)
+            }
+
+    def log_summary(self):
+        summary = self.summary()
+        for name, stage in sorted(summary['stages'].items(), key=lambda item: -item[1]['seconds']):
+            logging.info(f"Stage {name}: {stage['seconds']:.2f}s over {stage['count']} calls, max {stage['max_seconds']:.2f}s")
+        if summary['counters']:
+            logging.info('Run counters: ' + ', '.join(f'{name}: {value}' for name, value in sorted(summary['counters'].items())))
+
+    def start_profile(self):
+        # cProfile covers the calling (main) thread, tracemalloc every thread
+        tracemalloc.start()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self, pstats_file, top=25):
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(os.path.dirname(pstats_file) or '.', exist_ok=True)
+        self.profiler.dump_stats(pstats_file)
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        functions = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:top]
+        self.profile = {
+            'pstats_file': pstats_file,
+            'top_cumulative': [
+                {'function': f'{filename}:{line}({name})', 'calls': calls, 'total_seconds': round(total, 6), 'cumulative_seconds': round(cumulative, 6)}
+                for (filename, line, name), (primitive_calls, calls, total, cumulative, callers) in functions
+            ],
+            'tracemalloc_peak_bytes': peak,
+            'top_allocations': [
+                {'location': str(statistic.traceback), 'bytes': statistic.size, 'blocks': statistic.count}
+                for statistic in snapshot.statistics('lineno')[:top]
+            ]
+        }
+        self.profiler = None
+
+    def write_report(self, report_file, args, api_summary):
+        report = {
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'wall_seconds': round(time.perf_counter() - self.started, 3),
+            # linux reports kilobytes
+            'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource is not None else None,
+            'args': vars(args),
+            'api': api_summary,
+            'profile': self.profile
+        }
+        report.update(self.summary())
+        os.makedirs(os.path.dirname(report_file) or '.', exist_ok=True)
+        with open(f'{report_file}.tmp', 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(f'{report_file}.tmp', report_file)
+        logging.info(f'Run report written to: {report_file}')
+
+class Countingstream(io.RawIOBase):
+    # read-only stream wrapper adding the bytes read to a run counter, e.g. for downloads read by pandas
+
+    def __init__(self, stream, stats, counter):
+        self.stream = stream
+        self.stats = stats
+        self.counter = counter
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self.stats.increment(self.counter, len(data))
+        return len(data)
+
+# process wide stage timers and counters, shared by every worker of the run
+runstats = Runstats()
@@ -0,0 +1,55 @@
+import glob
+import json
+import logging
+import os
+import pandas as pd
+from datetime import datetime, timezone
+
+class Snapshot(object):
+    # raw collection output (inventory with metrics and the regional pricing index) saved per account/region
+    # layout: <snapshot_dir>/<account>_<region>/instances_<part>.pkl, pricing_index.json, meta.json
+
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+
+    def save(self, instance_df, pricing_index, account_id, region, part=0):
+        job_dir = os.path.join(self.snapshot_dir, f'{account_id}_{region}')
+        os.makedirs(job_dir, exist_ok=True)
+        if part == 0:
+            # a new collection replaces every part of an older snapshot of the same job
+            for instance_file in glob.glob(os.path.join(job_dir, 'instances_*.pkl')):
+                os.remove(instance_file)
+        instance_df.to_pickle(os.path.join(job_dir, f'instances_{part:05d}.pkl'))
+        if part == 0:
+            with open(os.path.join(job_dir, 'pricing_index.json'), 'w') as f:
+                json.dump([[deployment, component, price] for (deployment, component), price in pricing_index.items()], f)
+            with open(os.path.join(job_dir, 'meta.json'), 'w') as f:
+                json.dump({'account': account_id, 'region': region, 'collected_at': datetime.now(timezone.utc).isoformat()}, f)
+        logging.debug(f'Snapshot part {part} saved to: {job_dir}')
+
+    def load_pricing_indexes(self):
+        # {region: pricing index}, the first saved index per region is used
+        pricing_indexes = {}
+        for meta_file in sorted(glob.glob(os.path.join(self.snapshot_dir, '*', 'meta.json'))):
+            with open(meta_file) as f:
+                region = json.load(f)['region']
+            if region in pricing_indexes:
+                continue
+            with open(os.path.join(os.path.dirname(meta_file), 'pricing_index.json')) as f:
+                pricing_indexes[region] = {(deployment, component): price for deployment, component, price in json.load(f)}
+        return pricing_indexes
+
+    def load_instances(self):
+        # one fleet-wide instance DataFrame with account_id and region columns from the job metadata
+        instance_dfs = []
+        for meta_file in sorted(glob.glob(os.path.join(self.snapshot_dir, '*', 'meta.json'))):
+            with open(meta_file) as f:
+                meta = json.load(f)
+            for instance_file in sorted(glob.glob(os.path.join(os.path.dirname(meta_file), 'instances_*.pkl'))):
+                instance_df = pd.read_pickle(instance_file)
+                instance_df['account_id'] = meta['account']
+                instance_df['region'] = meta['region']
+                instance_dfs.append(instance_df)
+        if not instance_dfs:
+            return pd.DataFrame()
+        return pd.concat(instance_dfs, ignore_index=True)
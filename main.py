@@ -5,7 +5,7 @@
 # utc start and endtime example: python main.py -s '2022-06-25 02:00:00' -e '2022-07-12 02:00:00'
 
 import argparse
-import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 import os
 import pandas as pd
@@ -14,7 +14,19 @@ from tabulate import tabulate
 import traceback
 
 from classes.getinstanceinfo import Getinstanceinfo
+from classes.asynccollector import Asynccollector
+from classes.costengine import Costengine
 from classes.getdata import Getdata
+from classes.fleetdataset import Fleetdataset
+from classes.metricstore import Metricstore
+from classes.pricingcache import Pricingcache
+from classes.rightsizing import Rightsizing
+from classes.clientregistry import clients
+from classes.credentialcache import credentialcache
+from classes.ratelimiter import apistats, ratelimiters
+from classes.runmanifest import Runmanifest
+from classes.runstats import runstats
+from classes.snapshot import Snapshot
 
 # parse command-line arguments for region and input file
 def parse_args():
@@ -28,109 +40,409 @@ def parse_args():
         parser.add_argument('-i', '--input_list', help='account and assume role input list', type=str, required=False)
         parser.add_argument('-p', '--percent_discount', help='public pricing discount', type=float, required=False)
         parser.add_argument('-l', '--log_level', help='python log level', type=str, required=False)
+        parser.add_argument('--pricing_cache_dir', help='directory for the local bulk pricing cache', type=str, required=False)
+        parser.add_argument('--pricing_ttl', help='hours before checking for a newer pricing offer version', type=float, required=False)
+        parser.add_argument('-w', '--workers', help='account/region jobs processed concurrently', type=int, required=False)
+        parser.add_argument('--async_collect', help='collect inventory and metrics for all jobs on one asyncio event loop', action='store_true')
+        parser.add_argument('--async_concurrency', help='concurrent calls per AWS service in async collection', type=int, required=False)
+        parser.add_argument('--endpoint_url', help='AWS endpoint override, e.g. a local stubbed AWS endpoint', type=str, required=False)
+        parser.add_argument('--pricing_endpoint', help='bulk pricing host override, e.g. a local mirror of pricing.us-east-1.amazonaws.com', type=str, required=False)
+        parser.add_argument('--api_rate', help='max AWS API requests per second per account, region and service', type=float, required=False)
+        parser.add_argument('--api_burst', help='AWS API request burst size per account, region and service', type=int, required=False)
+        parser.add_argument('--metric_cache', help='sqlite file for incremental hourly cloudwatch metrics', type=str, required=False)
+        parser.add_argument('--refresh_metrics', help='fetch the full metric window again instead of only missing hours', action='store_true')
+        parser.add_argument('--metric_retention_days', help='days of hourly metrics kept in the metric cache', type=int, required=False)
+        parser.add_argument('--chunk_size', help='stream instances through metrics, costing and csv output in chunks of this size', type=int, required=False)
+        parser.add_argument('--manifest', help='run manifest recording finished account/region jobs', type=str, required=False)
+        parser.add_argument('--resume', help='skip jobs completed in the run manifest and retry the others', action='store_true')
+        parser.add_argument('--snapshot_dir', help='save the raw inventory, metrics and pricing index for offline repricing', type=str, required=False)
+        parser.add_argument('--rightsize', help='recommend gp3 iops and throughput from the usage time series of each instance', action='store_true')
+        parser.add_argument('--rightsize_percentiles', help='usage percentiles to size gp3 for', type=float, nargs='+', required=False)
+        parser.add_argument('--rightsize_headroom', help='fraction added on top of the usage percentile', type=float, required=False)
+        parser.add_argument('--parquet_dir', help='also write the output to a parquet dataset partitioned by account and region', type=str, required=False)
+        parser.add_argument('--all_regions', help="discover and scan every enabled region of each account instead of the input list or -r region", action='store_true')
+        parser.add_argument('--report', help='write a json run report with stage timers, counters and api calls', action='store_true')
+        parser.add_argument('--report_file', help='run report path, implies --report, default data/reports/run_<utc time>.json', type=str, required=False)
+        parser.add_argument('--profile', help='add cProfile (main thread) and tracemalloc results to the run report, implies --report', action='store_true')
+        parser.add_argument('--offline', help='only use cached pricing data, no pricing downloads', action='store_true')
         parser.set_defaults(\
                             days_back = 7,
-                            log_level = 'INFO'
+                            log_level = 'INFO',
+                            pricing_cache_dir = 'cache/pricing',
+                            pricing_ttl = 24,
+                            workers = 1,
+                            async_concurrency = 16,
+                            api_rate = 20,
+                            api_burst = 10,
+                            metric_retention_days = 90,
+                            manifest = 'data/run_manifest.json',
+                            rightsize_percentiles = [95, 99],
+                            rightsize_headroom = 0.2
                             )
         args = parser.parse_args()
+        if args.async_collect and args.chunk_size is not None:
+            parser.error('--chunk_size streams one job at a time and cannot be combined with --async_collect')
         return args
     except Exception as e: 
         logging.error(f'An error occurred during parsing of args')
         traceback.print_exc()
 
-def process_account_region(args, session, region, account_id):
+def collect_account_region(args, session, region, account_id):
         getinstanceinfo = Getinstanceinfo()
-        getdata = Getdata()
 
         # gather all rds instances in region 
         logging.info(f"Region is set to: {region}, gathering RDS instance list.")
-        instance_df = getinstanceinfo.get_instance_list(args, session, region)
+        with runstats.stage('describe_db_instances'):
+            instance_df = getinstanceinfo.get_instance_list(args, session, region, account_id)
+        runstats.increment('instances_collected', len(instance_df))
         
         # retreiving metrics - FreeStorageSpace, WriteIOPS, ReadIOPS, ReadThroughput, WriteThroughput
         if not instance_df.empty:
-            instance_df[['cw_storage_free', 'cw_storage_write_iops', 'cw_storage_read_iops', 'cw_storage_write_throughput', 'cw_storage_read_throughput']] = \
-                instance_df.apply (lambda row: getinstanceinfo.get_instance_usage(row, args, session, region), axis=1, result_type='expand')
+            instance_df = collect_instance_usage(args, instance_df, session, region, account_id)
+        return instance_df
 
-            # pull down bulk price list for region
-            rds_pricing_df = getinstanceinfo.get_instance_pricing_data(region)
+def collect_instance_usage(args, instance_df, session, region, account_id):
+        # cw_storage_* window statistics, with --rightsize they come from the same time series pull as the usage percentiles
+        getinstanceinfo = Getinstanceinfo()
+        with runstats.stage('cloudwatch_usage'):
+            if args.rightsize:
+                rightsizing = Rightsizing(args.rightsize_percentiles, args.rightsize_headroom)
+                usage_df = rightsizing.get_usage_statistics(instance_df, args, session, region, account_id)
+            else:
+                usage_df = getinstanceinfo.get_instance_usage(instance_df, args, session, region, account_id)
+        return getinstanceinfo.add_instance_usage(instance_df, usage_df, region, account_id)
 
-            # add in IOPS estimate for io1
-            instance_df['storage_throughput'] = \
-                instance_df.apply (lambda row: getinstanceinfo.calc_io1_throughput(row, rds_pricing_df, args), axis=1, result_type='expand')
+def get_output_file(args, account_id, region):
+    if args.output_file is not None:
+        return args.output_file
+    os.makedirs('data', exist_ok=True)
+    return f"data/{account_id}_{region}_rds_output.csv"
 
-            # calculate reasonable throughput 
-            instance_df['current_monthly_storage_cost'] = \
-                instance_df.apply (lambda row: getinstanceinfo.get_current_price(row, rds_pricing_df, args), axis=1, result_type='expand')
+def cost_instances(args, instance_df, pricing_index):
+    with runstats.stage('costing'):
+        getdata = Getdata()
+        costengine = Costengine()
 
-            # add pricing for gp3 storage - same parameters as current storage
-            instance_df['gp3_monthly_storage_cost'] = \
-                instance_df.apply (lambda row: getinstanceinfo.get_future_price(row, rds_pricing_df, args), axis=1, result_type='expand')
+        # add in throughput estimate for io1
+        instance_df['storage_throughput'] = costengine.calc_io1_throughput(instance_df)
 
-            # change bytes to gigabytes
-            instance_df['gp3_monthly_storage_cost'] = \
-                instance_df.apply (lambda row: getinstanceinfo.get_future_price(row, rds_pricing_df, args), axis=1, result_type='expand')
+        # calculate current io1 storage costs
+        instance_df['current_monthly_storage_cost'] = costengine.get_current_price(instance_df, pricing_index, args)
 
-            # add pricing for rightsized gp3 storage
-            instance_df['cw_storage_free'] = instance_df['cw_storage_free'].apply(getdata.convert_bytes_to_gb)
+        # add pricing for gp3 storage - same parameters as current storage
+        instance_df['gp3_monthly_storage_cost'] = costengine.get_future_price(instance_df, pricing_index, args)
 
+        # cheapest gp3 settings covering observed usage
+        if args.rightsize:
+            instance_df = Rightsizing(args.rightsize_percentiles, args.rightsize_headroom).recommend(instance_df, pricing_index, args)
+
+        # change bytes to gigabytes
+        instance_df['cw_storage_free'] = instance_df['cw_storage_free'].apply(getdata.convert_bytes_to_gb)
+
+        # tabulate of the whole frame is expensive, only build it when it is logged
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
             logging.debug(tabulate(instance_df, headers='keys', tablefmt='psql'))
-            
-            instance_df = getinstanceinfo.gen_summary_statistics(instance_df)
+        return instance_df
+
+def cost_account_region(args, instance_df, region, account_id, pricing_cache):
+        getinstanceinfo = Getinstanceinfo()
+
+        if not instance_df.empty:
+            # pull down bulk price list for region (or load it from the local cache), reduced to storage prices
+            with runstats.stage('pricing_index'):
+                pricing_index = pricing_cache.get_pricing_index(region)
+            if pricing_index is None:
+                logging.error(f"No pricing data available for region {region}, skipping account: {account_id}")
+                return False
+
+            # raw collection output for reprice.py, saved before any costing columns are added
+            if args.snapshot_dir is not None:
+                with runstats.stage('snapshot'):
+                    Snapshot(args.snapshot_dir).save(instance_df, pricing_index, account_id, region)
+
+            instance_df = cost_instances(args, instance_df, pricing_index)
+            with runstats.stage('summary'):
+                instance_df = getinstanceinfo.gen_summary_statistics(instance_df)
+            runstats.increment('instances_priced', len(instance_df))
+            if args.rightsize:
+                rightsizing = Rightsizing(args.rightsize_percentiles, args.rightsize_headroom)
+                rightsizing.log_summary(rightsizing.update_summary({}, instance_df))
 
             # output to local csv 
-            if args.output_file is not None:
-                instance_df.to_csv(args.output_file, index=False)
-                logging.info(f'Output file written to: {args.output_file}')
-            else:
-                if not os.path.exists('data'):
-                    os.makedirs('data')
-                output_file = f"data/{account_id}_{region}_rds_output.csv"
+            with runstats.stage('output'):
+                output_file = get_output_file(args, account_id, region)
                 instance_df.to_csv(output_file, index=False)
                 logging.info(f'Output file written to: {output_file}')
+                if args.parquet_dir is not None:
+                    Fleetdataset(args.parquet_dir).write(instance_df, account_id, region)
         else:
             logging.info(f"No RDS instances found in account: {account_id} for region {region}")
+        return True
+
+def process_account_region_streaming(args, session, region, account_id, pricing_cache):
+        # inventory page -> metric batch -> costing -> append to csv, one chunk of instances at a time
+        getinstanceinfo = Getinstanceinfo()
+
+        with runstats.stage('pricing_index'):
+            pricing_index = pricing_cache.get_pricing_index(region)
+        if pricing_index is None:
+            logging.error(f"No pricing data available for region {region}, skipping account: {account_id}")
+            return False
+
+        logging.info(f"Region is set to: {region}, streaming RDS instances in chunks of {args.chunk_size}.")
+        output_file = get_output_file(args, account_id, region)
+        summary = {}
+        rightsizing_summary = {}
+        chunks = 0
+        instance_chunks = getinstanceinfo.iter_instance_chunks(args, session, region, account_id, args.chunk_size)
+        while True:
+            # the describe_db_instances pages of a chunk are fetched when the next chunk is requested
+            with runstats.stage('describe_db_instances'):
+                instance_df = next(instance_chunks, None)
+            if instance_df is None:
+                break
+            if instance_df.empty:
+                continue
+            runstats.increment('instances_collected', len(instance_df))
+            instance_df = collect_instance_usage(args, instance_df, session, region, account_id)
+            if args.snapshot_dir is not None:
+                with runstats.stage('snapshot'):
+                    Snapshot(args.snapshot_dir).save(instance_df, pricing_index, account_id, region, part=chunks)
+            instance_df = cost_instances(args, instance_df, pricing_index)
+            with runstats.stage('summary'):
+                instance_df = getinstanceinfo.update_summary_statistics(summary, instance_df)
+                if args.rightsize:
+                    Rightsizing(args.rightsize_percentiles, args.rightsize_headroom).update_summary(rightsizing_summary, instance_df)
+            runstats.increment('instances_priced', len(instance_df))
+
+            # partial results are on disk as soon as each chunk finishes
+            with runstats.stage('output'):
+                instance_df.to_csv(output_file, mode='w' if chunks == 0 else 'a', header=chunks == 0, index=False)
+                if args.parquet_dir is not None:
+                    Fleetdataset(args.parquet_dir).write(instance_df, account_id, region, part=chunks)
+            chunks += 1
+            logging.info(f"Chunk {chunks} for account: {account_id} region: {region} written to: {output_file}")
+
+        if chunks == 0:
+            logging.info(f"No RDS instances found in account: {account_id} for region {region}")
+        else:
+            getinstanceinfo.log_summary_statistics(summary)
+            if args.rightsize:
+                Rightsizing(args.rightsize_percentiles, args.rightsize_headroom).log_summary(rightsizing_summary)
+        return True
+
+def process_account_region(args, session, region, account_id, pricing_cache):
+        if args.chunk_size is not None:
+            return process_account_region_streaming(args, session, region, account_id, pricing_cache)
+        instance_df = collect_account_region(args, session, region, account_id)
+        return cost_account_region(args, instance_df, region, account_id, pricing_cache)
+
+def record_job(args, manifest, account_id, region, succeeded, error=None):
+    runstats.increment('jobs_completed' if succeeded else 'jobs_failed')
+    if manifest is None:
+        return
+    if succeeded:
+        output_file = get_output_file(args, account_id, region)
+        manifest.mark(account_id, region, 'completed', output_file=output_file if os.path.exists(output_file) else None)
+    else:
+        manifest.mark(account_id, region, 'failed', error=error or 'job failed, see log for details')
+
+def process_async(args, jobs, pricing_cache, manifest=None):
+    # collect inventory and metrics for all jobs on one event loop, then run the costing stage per job
+    collected = Asynccollector(args).collect(jobs)
+    failed_jobs = []
+    for job, instance_df in zip(jobs, collected):
+        try:
+            if isinstance(instance_df, Exception):
+                raise instance_df
+            succeeded = cost_account_region(args, instance_df, job['region'], job['account'], pricing_cache)
+            record_job(args, manifest, job['account'], job['region'], succeeded)
+            if not succeeded:
+                failed_jobs.append(f"{job['account']}/{job['region']}")
+        except Exception as e: 
+            logging.error(f"An error occurred processing account: {job['account']} in region: {job['region']}")
+            traceback.print_exception(type(e), e, e.__traceback__)
+            record_job(args, manifest, job['account'], job['region'], False, repr(e))
+            failed_jobs.append(f"{job['account']}/{job['region']}")
+    return failed_jobs
+
+def get_role_session(args, sts, role_arn, account_id, region=None):
+    # one session per role arn for all regions and workers, its sts credentials are refreshed before they expire
+    return credentialcache.get_session(sts, role_arn, account_id, region)
+
+def process_region_job(args, session, account_id, region, pricing_cache, manifest):
+    # one account/region, errors stay within the job so the sweep continues
+    try:
+        if manifest is not None:
+            manifest.mark(account_id, region, 'running')
+        succeeded = process_account_region(args, session, region, account_id, pricing_cache)
+        record_job(args, manifest, account_id, region, succeeded)
+        return succeeded
+    except Exception as e: 
+        logging.error(f'An error occurred processing account: {account_id} in region: {region}')
+        traceback.print_exc()
+        record_job(args, manifest, account_id, region, False, repr(e))
+        return False
+
+def process_account_job(args, sts, account_row, pricing_cache, manifest):
+    # one account/region from the input list
+    region = account_row['region']
+    account_id = account_row['account']
+    try:
+        # an empty role_arn cell is NaN after read_csv, the job then runs as the current principal
+        if pd.isna(account_row.get('role_arn')):
+            session = clients.get_session(region)
+        else:
+            session = get_role_session(args, sts, account_row['role_arn'], account_id, region)
+    except Exception as e: 
+        logging.error(f'An error occurred processing account: {account_id} in region: {region}')
+        traceback.print_exc()
+        record_job(args, manifest, account_id, region, False, repr(e))
+        return False
+    return process_region_job(args, session, account_id, region, pricing_cache, manifest)
+
+def discover_account_regions(args, sts, account_row):
+    # one session per account (assumed role, or the current principal without role_arn) and its enabled regions
+    account_id = account_row['account']
+    try:
+        if pd.isna(account_row.get('role_arn')):
+            session = clients.get_session(args.region)
+        else:
+            session = get_role_session(args, sts, account_row['role_arn'], account_id)
+        with runstats.stage('region_discovery'):
+            regions = Getinstanceinfo().get_enabled_regions(args, session, account_id)
+        if regions is not None:
+            logging.info(f"Account: {account_id} has {len(regions)} enabled regions: {', '.join(regions)}")
+        return session, regions
+    except Exception as e: 
+        logging.error(f'An error occurred discovering regions for account: {account_id}')
+        traceback.print_exc()
+        return None, None
+
+def process_all_regions(args, sts, accounts, pricing_cache, manifest=None):
+    # region discovery per account, then every account/region is its own job on the same worker pool
+    # pricing_cache loads each region's pricing once and shares it across accounts
+    region_jobs = []
+    failed_jobs = []
+    # accounts whose regions could not be discovered have no jobs, they are reported separately
+    failed_accounts = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        discovery = {executor.submit(discover_account_regions, args, sts, account_row): account_row for account_row in accounts}
+        for future in as_completed(discovery):
+            account_row = discovery[future]
+            session, regions = future.result()
+            if regions is None:
+                runstats.increment('region_discovery_failed')
+                failed_accounts.append(account_row['account'])
+                continue
+            for region in regions:
+                if manifest is not None and args.resume and manifest.is_completed(account_row['account'], region):
+                    continue
+                region_jobs.append({'account': account_row['account'], 'region': region, 'role_arn': account_row.get('role_arn'), 'session': session})
+        logging.info(f"Discovered {len(region_jobs)} account/region jobs to process in {len(accounts)} accounts")
+
+        if args.async_collect:
+            if manifest is not None:
+                for job in region_jobs:
+                    manifest.mark(job['account'], job['region'], 'running')
+            failed_jobs.extend(process_async(args, region_jobs, pricing_cache, manifest))
+        else:
+            futures = {executor.submit(process_region_job, args, job['session'], job['account'], job['region'], pricing_cache, manifest): job for job in region_jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                if not future.result():
+                    failed_jobs.append(f"{job['account']}/{job['region']}")
+    return region_jobs, failed_jobs, failed_accounts
+
+def log_job_summary(jobs, failed_jobs, failed_accounts):
+    logging.info(f"Processed {len(jobs) - len(failed_jobs)} of {len(jobs)} account/region jobs")
+    if failed_jobs:
+        logging.error(f"Failed account/region jobs: {', '.join(failed_jobs)}")
+    if failed_accounts:
+        logging.error(f"Region discovery failed for accounts: {', '.join(failed_accounts)}")
 
 def main():
 
     args = parse_args()
 
     logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=args.log_level)
+    if args.profile:
+        runstats.start_profile()
 
     getinstanceinfo = Getinstanceinfo()
+    pricing_cache = Pricingcache(args.pricing_cache_dir, args.pricing_ttl, args.offline, args.pricing_endpoint)
+    ratelimiters.configure(args.api_rate, args.api_burst)
+
+    if args.metric_cache is not None:
+        metricstore = Metricstore(args.metric_cache)
+        metricstore.evict(args.metric_retention_days)
+        metricstore.close()
 
     # when an input role and region list is specified
     if args.input_list is not None:
         # read in df: account, region, role_arn
         df_role = pd.read_csv(args.input_list, dtype={'account': str, 'region': str, 'role_arn': str})
 
-        sts = boto3.client('sts')
+        sts = clients.get_client(clients.get_session(), 'sts', None, 'caller', args.endpoint_url)
 
-        for index, account_row in df_role.iterrows():
-            region = account_row['region']
-            account_id = account_row['account']
-
-            logging.info(f"Assuming role: {account_row['role_arn']} in account: {account_row['account']}")
-            member_account = sts.assume_role(RoleArn=account_row['role_arn'], RoleSessionName='rds-info-gathering')
-        
-            # retrieve creds from member account
-            access_key = member_account['Credentials']['AccessKeyId']
-            secret_key = member_account['Credentials']['SecretAccessKey']
-            session_token = member_account['Credentials']['SessionToken']
+        # with --resume, jobs completed in an earlier run are skipped and failed ones are retried
+        manifest = Runmanifest(args.manifest, args.resume)
+        failed_accounts = []
+        if args.all_regions:
+            # the region column is not needed, every enabled region of each account is scanned
+            accounts = df_role.drop_duplicates('account').to_dict('records')
+            jobs, failed_jobs, failed_accounts = process_all_regions(args, sts, accounts, pricing_cache, manifest)
+        else:
+            if args.resume and not df_role.empty:
+                completed = df_role.apply(lambda account_row: manifest.is_completed(account_row['account'], account_row['region']), axis=1)
+                logging.info(f"Skipping {int(completed.sum())} account/region jobs already completed")
+                df_role = df_role[~completed]
 
-            # pass the session (with the sts credentials) to create temporary regional keys
-            session = boto3.Session(region_name=region, aws_access_key_id=access_key, aws_secret_access_key=secret_key, aws_session_token=session_token)
+            jobs = df_role.to_dict('records')
+            if args.async_collect:
+                for job in jobs:
+                    manifest.mark(job['account'], job['region'], 'running')
+                failed_jobs = process_async(args, jobs, pricing_cache, manifest)
+            else:
+                # fan account/region jobs out to a bounded thread pool, pricing is shared through pricing_cache
+                failed_jobs = []
+                with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                    futures = {executor.submit(process_account_job, args, sts, account_row, pricing_cache, manifest): account_row for account_row in jobs}
+                    for future in as_completed(futures):
+                        account_row = futures[future]
+                        if not future.result():
+                            failed_jobs.append(f"{account_row['account']}/{account_row['region']}")
 
-            process_account_region(args, session, region, account_id)
+        log_job_summary(jobs, failed_jobs, failed_accounts)
 
     # when no input_list is specified, and uses the current account and IAM principal (IAM user or assumed role)
     else:
         region = args.region
         # get current account and role
-        account_id, account_arn = getinstanceinfo.get_account_info(args)
+        with runstats.stage('account_info'):
+            account_id, account_arn = getinstanceinfo.get_account_info(args)
         logging.info(f"Currently using account: {account_id} with IAM user or assumed role of: {account_arn}")
-        session = boto3.Session(region_name=args.region)
+        failed_accounts = []
+        if args.all_regions:
+            jobs, failed_jobs, failed_accounts = process_all_regions(args, None, [{'account': account_id, 'role_arn': None}], pricing_cache)
+        elif args.async_collect:
+            jobs = [{'account': account_id, 'region': region, 'role_arn': None}]
+            failed_jobs = process_async(args, jobs, pricing_cache)
+        else:
+            jobs = [{'account': account_id, 'region': region}]
+            session = clients.get_session(args.region)
+            failed_jobs = [] if process_account_region(args, session, region, account_id, pricing_cache) else [f'{account_id}/{region}']
+        log_job_summary(jobs, failed_jobs, failed_accounts)
+
+    apistats.log_summary()
+    runstats.log_summary()
 
-        process_account_region(args, session, region, account_id)
+    # machine readable run report, e.g. to track stage timings across runs
+    if args.report or args.report_file is not None or args.profile:
+        report_file = args.report_file or f'data/reports/run_{runstats.started_at:%Y%m%dT%H%M%SZ}.json'
+        if args.profile:
+            runstats.stop_profile(os.path.splitext(report_file)[0] + '.pstats')
+        runstats.write_report(report_file, args, apistats.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
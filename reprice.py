@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# purpose: to reprice a saved collection snapshot (main.py --snapshot_dir) for several discounts without any AWS calls
+# example with three PPA discounts: python reprice.py --snapshot_dir data/snapshot -p 0 0.15 0.19
+# pricing from a newer snapshot: python reprice.py --snapshot_dir data/snapshot -p 0.19 --pricing_snapshot data/snapshot_new
+
+import argparse
+import logging
+import numpy as np
+import os
+import pandas as pd
+from tabulate import tabulate
+import time
+import traceback
+
+from classes.costengine import Costengine
+from classes.snapshot import Snapshot
+
+# parse command-line arguments for snapshot and scenarios
+def parse_args():
+    try:
+        parser = argparse.ArgumentParser(description='offline what-if repricing of a saved snapshot')
+        parser.add_argument('--snapshot_dir', help='snapshot saved by main.py --snapshot_dir', type=str, required=True)
+        parser.add_argument('-p', '--percent_discounts', help='public pricing discounts to evaluate', type=float, nargs='+', required=False)
+        parser.add_argument('--pricing_snapshot', help='other snapshots whose pricing indexes are evaluated as well', type=str, nargs='*', required=False)
+        parser.add_argument('-o', '--output_file', help='per instance cost output filepath', type=str, required=False)
+        parser.add_argument('--summary_file', help='per scenario summary output filepath', type=str, required=False)
+        parser.add_argument('-l', '--log_level', help='python log level', type=str, required=False)
+        parser.set_defaults(\
+                            percent_discounts = [0.0],
+                            pricing_snapshot = [],
+                            output_file = 'data/reprice_output.csv',
+                            summary_file = 'data/reprice_summary.csv',
+                            log_level = 'INFO'
+                            )
+        args = parser.parse_args()
+        return args
+    except Exception as e:
+        logging.error(f'An error occurred during parsing of args')
+        traceback.print_exc()
+
+def calc_base_costs(instance_df, pricing_indexes):
+    # undiscounted io1 and gp3 monthly costs for the whole fleet, priced region by region
+    costengine = Costengine()
+    io1_costs = np.full(len(instance_df), np.nan)
+    gp3_costs = np.full(len(instance_df), np.nan)
+    for region, positions in instance_df.groupby('region', observed=True).indices.items():
+        pricing_index = pricing_indexes.get(region)
+        if pricing_index is None:
+            logging.warning(f"No pricing index for region {region}, {len(positions)} instances are not priced")
+            continue
+        region_df = instance_df.iloc[positions]
+        io1_costs[positions] = costengine.calc_io1_costs(region_df, pricing_index)
+        gp3_costs[positions] = costengine.calc_gp3_costs(region_df, pricing_index)
+    return io1_costs, gp3_costs
+
+def reprice(instance_df, pricing_scenarios, percent_discounts):
+    # every (pricing, discount) scenario in one pass: the discounts are broadcast over a rows x discounts matrix
+    costengine = Costengine()
+    discounts = np.asarray(percent_discounts, dtype=float)
+    instance_df['storage_throughput'] = costengine.calc_io1_throughput(instance_df)
+    is_io1 = (instance_df['storage_type'] == 'io1').to_numpy()
+
+    cost_columns = {}
+    summary_rows = []
+    for pricing_label, pricing_indexes in pricing_scenarios.items():
+        io1_costs, gp3_costs = calc_base_costs(instance_df, pricing_indexes)
+        current_costs = costengine.apply_discount(io1_costs[:, None], discounts[None, :])
+        future_costs = costengine.apply_discount(gp3_costs[:, None], discounts[None, :])
+
+        # same rows as the summary statistics of main.py: io1 rows priced for both storage types
+        priced = is_io1 & ~np.isnan(current_costs[:, 0]) & ~np.isnan(future_costs[:, 0])
+        old_costs = current_costs[priced].sum(axis=0)
+        new_costs = future_costs[priced].sum(axis=0)
+
+        for column, discount in enumerate(discounts):
+            scenario = f'{pricing_label}_p{discount:g}'
+            cost_columns[f'current_monthly_storage_cost_{scenario}'] = current_costs[:, column]
+            cost_columns[f'gp3_monthly_storage_cost_{scenario}'] = future_costs[:, column]
+            old_cost = old_costs[column]
+            new_cost = new_costs[column]
+            summary_rows.append({
+                'pricing': pricing_label,
+                'percent_discount': discount,
+                'instances': int(priced.sum()),
+                'old_cost': old_cost,
+                'new_cost': new_cost,
+                'total_savings': old_cost - new_cost,
+                'percent_reduction': int(abs((100 * float(new_cost)/float(old_cost))-100)) if old_cost > 0 else 0
+            })
+
+    identity_columns = [column for column in ['account_id', 'region', 'instance', 'db', 'engine', 'multi_az', 'storage_type', 'storage_size', 'storage_iops', 'storage_throughput'] if column in instance_df.columns]
+    cost_df = pd.concat([instance_df[identity_columns].reset_index(drop=True), pd.DataFrame(cost_columns)], axis=1)
+    return cost_df, pd.DataFrame(summary_rows)
+
+def main():
+
+    args = parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=args.log_level)
+
+    started = time.perf_counter()
+    snapshot = Snapshot(args.snapshot_dir)
+    instance_df = snapshot.load_instances()
+    if instance_df.empty:
+        logging.error(f'No instances found in snapshot: {args.snapshot_dir}')
+        return
+
+    # the snapshot's own pricing, then any other pricing snapshots (e.g. a later pricing date)
+    pricing_scenarios = {'snapshot': snapshot.load_pricing_indexes()}
+    for pricing_snapshot in args.pricing_snapshot:
+        pricing_scenarios[os.path.basename(os.path.normpath(pricing_snapshot))] = Snapshot(pricing_snapshot).load_pricing_indexes()
+    logging.info(f'Loaded {len(instance_df)} instances and {len(pricing_scenarios)} pricing snapshots in {time.perf_counter() - started:.2f}s')
+
+    cost_df, summary_df = reprice(instance_df, pricing_scenarios, args.percent_discounts)
+
+    for output_file in (args.output_file, args.summary_file):
+        if os.path.dirname(output_file):
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    cost_df.to_csv(args.output_file, index=False)
+    summary_df.to_csv(args.summary_file, index=False)
+
+    logging.info('\n' + tabulate(summary_df, headers='keys', tablefmt='psql', showindex=False))
+    logging.info(f'Repriced {len(summary_df)} scenarios in {time.perf_counter() - started:.2f}s, output files written to: {args.output_file}, {args.summary_file}')
+
+if __name__ == "__main__":
+    main()
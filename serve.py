@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# purpose: local http service answering io1 to gp3 storage estimates from warm regional pricing indexes
+# example: python serve.py -r us-east-1 us-east-2 --port 8080 --refresh_minutes 60
+# request: curl -s localhost:8080/price -d '{"percent_discount": 0.19, "items": [{"region": "us-east-1", "engine": "postgres", "storage_size": 500, "storage_iops": 12000, "multi_az": true}]}'
+# metrics: curl -s localhost:8080/metrics
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import traceback
+
+from classes.pricingcache import Pricingcache
+from classes.pricingservice import Pricingservice
+
+# parse command-line arguments for the listener and pricing
+def parse_args():
+    try:
+        parser = argparse.ArgumentParser(description='storage pricing estimation service')
+        parser.add_argument('--host', help='listen address', type=str, required=False)
+        parser.add_argument('--port', help='listen port', type=int, required=False)
+        parser.add_argument('-r', '--regions', help='regions loaded at startup, other regions are loaded on first request', type=str, nargs='+', required=False)
+        parser.add_argument('--refresh_minutes', help='minutes between pricing index refreshes', type=float, required=False)
+        parser.add_argument('--pricing_cache_dir', help='directory for the local bulk pricing cache', type=str, required=False)
+        parser.add_argument('--pricing_ttl', help='hours before checking for a newer pricing offer version', type=float, required=False)
+        parser.add_argument('--pricing_endpoint', help='bulk pricing host override, e.g. a local mirror of pricing.us-east-1.amazonaws.com', type=str, required=False)
+        parser.add_argument('--offline', help='only use cached pricing data, no pricing downloads', action='store_true')
+        parser.add_argument('--max_items', help='max items per price request', type=int, required=False)
+        parser.add_argument('-l', '--log_level', help='python log level', type=str, required=False)
+        parser.set_defaults(\
+                            host = '127.0.0.1',
+                            port = 8080,
+                            regions = ['us-east-1'],
+                            refresh_minutes = 60,
+                            pricing_cache_dir = 'cache/pricing',
+                            pricing_ttl = 24,
+                            max_items = 10000,
+                            log_level = 'INFO'
+                            )
+        args = parser.parse_args()
+        return args
+    except Exception as e:
+        logging.error(f'An error occurred during parsing of args')
+        traceback.print_exc()
+
+class Pricingrequesthandler(BaseHTTPRequestHandler):
+    # GET /health, GET /metrics, POST /price with {"percent_discount": optional, "items": [...]}
+
+    service = None
+    max_items = 10000
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            self.send_json(200, self.service.metrics())
+        else:
+            self.send_json(404, {'error': f'unknown path: {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/price':
+            self.send_json(404, {'error': f'unknown path: {self.path}'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            items = request['items']
+            if not isinstance(items, list) or len(items) > self.max_items:
+                self.send_json(400, {'error': f'items must be a list of at most {self.max_items} storage configs'})
+                return
+            percent_discount = request.get('percent_discount')
+            if percent_discount is not None and (isinstance(percent_discount, bool) or not isinstance(percent_discount, (int, float))):
+                self.send_json(400, {'error': 'percent_discount must be a number'})
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': f'invalid request: {e!r}'})
+            return
+        error = self.service.validate_items(items)
+        if error is not None:
+            self.send_json(400, {'error': error})
+            return
+        try:
+            self.send_json(200, {'items': self.service.price(items, percent_discount)})
+        except Exception as e:
+            logging.error(f'An error occurred pricing a request of {len(items)} items')
+            traceback.print_exc()
+            self.send_json(500, {'error': repr(e)})
+
+    def log_message(self, format, *args):
+        logging.debug(f'{self.address_string()} - {format % args}')
+
+def main():
+
+    args = parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=args.log_level)
+
+    pricing_cache = Pricingcache(args.pricing_cache_dir, args.pricing_ttl, args.offline, args.pricing_endpoint)
+    service = Pricingservice(pricing_cache, args.regions, args.refresh_minutes)
+    service.warm()
+    service.start_refresh()
+
+    Pricingrequesthandler.service = service
+    Pricingrequesthandler.max_items = args.max_items
+    server = ThreadingHTTPServer((args.host, args.port), Pricingrequesthandler)
+    logging.info(f'Pricing service listening on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info('Pricing service stopped')
+    finally:
+        service.stop_event.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()